@@ -1,17 +1,120 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, make_response, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, session, make_response, send_from_directory, Response, stream_with_context, jsonify, g, has_request_context
 import logging
 from logging.handlers import RotatingFileHandler
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSqlaSession
+from markupsafe import Markup
+from sqlalchemy import event as sa_event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session as OrmSession
 import os
-from datetime import date
+from datetime import date, datetime, timedelta
 import csv
 from functools import wraps
+from contextlib import contextmanager
+import atexit
+import threading
+import click
+from array import array
+from collections import namedtuple, Counter, OrderedDict, defaultdict
+import heapq
+from operator import itemgetter
+import sqlite3
+import time
+import uuid
+import re
+import json
+import hashlib
+import zlib
+import gzip
+import mimetypes
+from io import StringIO, BytesIO
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the journal then runs unlocked
+    fcntl = None
 
 # database stuff
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
+
+
+# Engine/pool settings from the environment (pool sizing does not apply to
+# in-memory SQLite). Per gunicorn worker the most connections held is
+# DB_POOL_SIZE + DB_MAX_OVERFLOW, so size them against Postgres'
+# max_connections / worker count. Pre-ping and recycling weed out
+# connections the server or a proxy closed while idle.
+def engine_options(url):
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') != '0',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    url = make_url(url or 'sqlite://')
+    backend = url.get_backend_name()
+    if backend != 'sqlite' or url.database not in (None, '', ':memory:'):
+        options.update(pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+                       max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+                       pool_timeout=float(os.environ.get('DB_POOL_TIMEOUT', 30)))
+    timeout_ms = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    if timeout_ms and backend == 'postgresql':
+        options['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+    return options
+
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+# optional read replica for the read-only staff views (see read_replica)
+if os.environ.get('DATABASE_REPLICA_URL'):
+    app.config['SQLALCHEMY_BINDS'] = {'replica': {'url': os.environ['DATABASE_REPLICA_URL'],
+                                                  **engine_options(os.environ['DATABASE_REPLICA_URL'])}}
 app.config['SECRET_KEY'] = 'supersecretkey'  # required for flash messages + sessions
-db = SQLAlchemy(app)
+app.config['ROSTER_CSV_PATH'] = os.environ.get('ROSTER_CSV_PATH', os.path.join(app.root_path, 'roster.csv'))
+app.config['EXPORT_GZIP'] = os.environ.get('EXPORT_GZIP', '1') != '0'
+app.config['FRAGMENT_CACHE_URL'] = os.environ.get('FRAGMENT_CACHE_URL', 'memory')
+app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('FRAGMENT_CACHE_SIZE', 256))
+app.config['ROSTER_JOURNAL_FLUSH_DELAY'] = float(os.environ.get('ROSTER_JOURNAL_FLUSH_DELAY', 2.0))
+# DB_INIT_ON_IMPORT=0 skips migrations at import; run them once instead with
+# 'flask db-upgrade' or the gunicorn.conf.py on_starting hook
+app.config['DB_INIT_ON_IMPORT'] = os.environ.get('DB_INIT_ON_IMPORT', '1') != '0'
+app.config['EXCUSAL_QUEUE_PATH'] = os.environ.get('EXCUSAL_QUEUE_PATH', '')  # empty: submit synchronously
+app.config['EXCUSAL_QUEUE_WORKERS'] = int(os.environ.get('EXCUSAL_QUEUE_WORKERS', 2))
+app.config['EXCUSAL_QUEUE_BATCH'] = int(os.environ.get('EXCUSAL_QUEUE_BATCH', 200))
+app.config['EXCUSAL_QUEUE_POLL'] = float(os.environ.get('EXCUSAL_QUEUE_POLL', 0.2))
+app.config['ARCHIVE_RETENTION_DAYS'] = int(os.environ.get('ARCHIVE_RETENTION_DAYS', 365))
+app.config['STATIC_IMAGE_WIDTHS'] = [int(w) for w in os.environ.get('STATIC_IMAGE_WIDTHS', '480,960').split(',') if w]
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', 500))
+app.config['N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))
+
+
+# Session that sends reads to the replica engine while a @read_replica view
+# is handling a GET. Flushes and bulk insert/update/delete always go to the
+# primary, so a stray write can never land on the replica.
+class ReplicaRoutingSession(FlaskSqlaSession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('use_replica') \
+                and not getattr(clause, 'is_dml', False) and 'replica' in self._db.engines:
+            return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(app, session_options={'class_': ReplicaRoutingSession})
+
+
+# Pools must not be shared across fork(): when the app is imported before
+# gunicorn forks its workers (--preload; init_db connects at import time)
+# every worker would inherit the master's pooled sockets. The child drops
+# its inherited pool without closing the parent's connections and opens its
+# own on first use.
+def _reset_pools_after_fork():
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
 
 STAFF_PASSWORD = os.environ.get("STAFF_PASSWORD", "noelleketo")
 
@@ -19,6 +122,8 @@ def staff_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not session.get("staff_logged_in"):
+            if request.is_json:
+                return jsonify(error="staff login required"), 401
             flash("Staff login required to access this page.")
             return redirect(url_for("staff_login"))
         return f(*args, **kwargs)
@@ -27,16 +132,31 @@ def staff_required(f):
 class Cadet(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
+    # lowercased/stripped copy of name so roster lookups are one indexed query
+    name_normalized = db.Column(db.String(100), index=True)
     rank = db.Column(db.String(50))
     status = db.Column(db.String(20), default="present") 
 
+    @db.validates('name')
+    def _sync_name_normalized(self, key, value):
+        self.name_normalized = normalize_name(value)
+        return value
+
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
-    date = db.Column(db.String(20), nullable=False)
+    date = db.Column(db.String(20), nullable=False, index=True)
+    # set once `flask archive` has moved the event's excusals/overrides out
+    archived_at = db.Column(db.String(40))
 
 
 class AttendanceOverride(db.Model):
+    # one override per cadet per event (whoiscoming upserts into it); event
+    # first so per-event lookups (matrix, recounts, archiving) use it too
+    __table_args__ = (
+        db.Index('uq_attendance_override_event_cadet', 'event_id', 'cadet_id', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     cadet_id = db.Column(db.Integer, db.ForeignKey('cadet.id'), nullable=False)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
@@ -44,7 +164,17 @@ class AttendanceOverride(db.Model):
 
 
 class Excusal(db.Model):
+    # attendance lookups: latest excusal per cadet for an event
+    __table_args__ = (
+        db.Index('ix_excusal_event_cadet_date', 'event_id', 'cadet_id', 'date'),
+        # keyset pagination of the pending queue
+        db.Index('ix_excusal_status_id', 'status', 'id'),
+        db.Index('uq_excusal_submission_token', 'submission_token', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
+    cadet_id = db.Column(db.Integer, db.ForeignKey('cadet.id'), index=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'))
     date = db.Column(db.String(20))
     cpt = db.Column(db.String(50))
     company = db.Column(db.String(100))
@@ -58,6 +188,423 @@ class Excusal(db.Model):
     status = db.Column(db.String(20), default="pending")
     phone = db.Column(db.String(50))
     email = db.Column(db.String(200))
+    # set at submission time; makes queued inserts idempotent and lets the
+    # submitter's session find the excusal again
+    submission_token = db.Column(db.String(36))
+
+
+# Cold storage for events past the retention window (see "Archival"
+# below). Same columns and ids as the live tables, minus the foreign keys
+# and the indexes only the live routes need, plus when the row was moved.
+class ExcusalArchive(db.Model):
+    __tablename__ = 'excusal_archive'
+    __table_args__ = (
+        db.Index('ix_excusal_archive_event_cadet_date', 'event_id', 'cadet_id', 'date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    cadet_id = db.Column(db.Integer)
+    event_id = db.Column(db.Integer)
+    date = db.Column(db.String(20), index=True)
+    cpt = db.Column(db.String(50))
+    company = db.Column(db.String(100))
+    event = db.Column(db.String(200))
+    excused_from = db.Column(db.String(200))
+    reason = db.Column(db.String(300))
+    makeup_plan = db.Column(db.String(300))
+    poc = db.Column(db.String(100))
+    name = db.Column(db.String(100))
+    position = db.Column(db.String(100))
+    status = db.Column(db.String(20))
+    phone = db.Column(db.String(50))
+    email = db.Column(db.String(200))
+    submission_token = db.Column(db.String(36))
+    archived_at = db.Column(db.String(40))
+
+
+class AttendanceOverrideArchive(db.Model):
+    __tablename__ = 'attendance_override_archive'
+    __table_args__ = (
+        db.Index('ix_attendance_override_archive_event_cadet', 'event_id', 'cadet_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    cadet_id = db.Column(db.Integer, nullable=False)
+    event_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    archived_at = db.Column(db.String(40))
+
+
+# Materialized headcounts per event (see "Attendance summary" below)
+class EventAttendanceSummary(db.Model):
+    __tablename__ = 'event_attendance_summary'
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), primary_key=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    pending = db.Column(db.Integer, nullable=False, default=0)
+    excused = db.Column(db.Integer, nullable=False, default=0)
+    unknown = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Monotonic per-dataset version counters shared by every worker through the
+# database, one row per table. Any transaction that writes a table bumps its
+# counter as part of the same commit (see the session hooks below), so
+# per-process caches and HTTP validators can compare versions to decide
+# whether what they hold is still fresh.
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.String(40))
+
+
+UNVERSIONED_TABLES = {'data_version', 'schema_version'}
+
+
+# helper: INSERT that supports on_conflict_do_update/do_nothing, or None
+# when the database has no upsert we know how to build
+def upsert_insert(model, session=None):
+    # dialect modules load lazily; the engine has already imported its own
+    dialect = (session or db.session).get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects import sqlite
+        return sqlite.insert(model)
+    return None
+
+
+def get_data_version(name):
+    return db.session.query(DataVersion.version).filter_by(name=name).scalar() or 0
+
+
+def get_data_versions(names):
+    """{name: (version, updated_at)} for the given names in one query."""
+    found = {r.name: (r.version, r.updated_at)
+             for r in db.session.query(DataVersion).filter(DataVersion.name.in_(list(names)))}
+    return {n: found.get(n, (0, None)) for n in names}
+
+
+def bump_data_version(name, session=None):
+    """Increment a version counter inside the current transaction."""
+    session = session or db.session
+    now = datetime.utcnow().isoformat()
+    stmt = upsert_insert(DataVersion, session)
+    if stmt is not None:
+        session.execute(stmt.values(name=name, version=1, updated_at=now).on_conflict_do_update(
+            index_elements=['name'], set_={'version': DataVersion.version + 1, 'updated_at': now}))
+        return
+    updated = session.execute(
+        db.update(DataVersion).where(DataVersion.name == name)
+        .values(version=DataVersion.version + 1, updated_at=now)).rowcount
+    if not updated:
+        session.add(DataVersion(name=name, version=1, updated_at=now))
+
+
+def mark_data_changed(session, *tables):
+    session.info.setdefault('changed_tables', set()).update(t for t in tables if t not in UNVERSIONED_TABLES)
+
+
+# Besides one counter per table there are finer-grained ones for the
+# attendance fragment cache: 'roster' (cadets added, removed, renamed --
+# not status changes), 'attendance:<event_id>' (excusals/overrides of one
+# event) and 'attendance' (bulk excusal/override writes whose events are
+# unknown). Bulk statements can name their events with the
+# attendance_events execution option, and bulk cadet updates that leave
+# names alone say so with roster_unchanged=True.
+ATTENDANCE_TABLES = {'excusal', 'attendance_override'}
+
+
+def _attendance_keys(obj):
+    event_ids = {getattr(obj, 'event_id', None)}
+    state = db.inspect(obj)
+    if state.persistent or state.deleted:
+        event_ids.update(state.attrs.event_id.history.deleted or ())
+    return {f'attendance:{e}' for e in event_ids if e}
+
+
+# ORM unit-of-work changes (add/modify/delete of model objects)
+@sa_event.listens_for(OrmSession, 'before_flush')
+def _track_flushed_tables(session, flush_context, instances):
+    objs = list(session.new) + list(session.dirty) + list(session.deleted)
+    names = set()
+    for o in objs:
+        table = getattr(type(o), '__table__', None)
+        if table is None:
+            continue
+        names.add(table.name)
+        if table.name in ATTENDANCE_TABLES:
+            names |= _attendance_keys(o)
+        elif table.name == 'cadet':
+            state = db.inspect(o)
+            if o in session.new or o in session.deleted or \
+                    state.attrs.name.history.has_changes() or state.attrs.rank.history.has_changes():
+                names.add('roster')
+    mark_data_changed(session, *names)
+
+
+# bulk insert/update/delete statements run through session.execute()
+@sa_event.listens_for(OrmSession, 'do_orm_execute')
+def _track_bulk_statements(orm_execute_state):
+    if (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete) \
+            and orm_execute_state.bind_mapper is not None:
+        table = orm_execute_state.bind_mapper.local_table.name
+        options = orm_execute_state.execution_options
+        names = {table}
+        if table in ATTENDANCE_TABLES:
+            events = options.get('attendance_events')
+            names |= {f'attendance:{e}' for e in events} if events is not None else {'attendance'}
+        elif table == 'cadet' and not (orm_execute_state.is_update and options.get('roster_unchanged')):
+            names.add('roster')
+        mark_data_changed(orm_execute_state.session, *names)
+
+
+@sa_event.listens_for(OrmSession, 'before_commit')
+def _bump_changed_tables(session):
+    session.flush()
+    changed = session.info.pop('changed_tables', None)
+    for name in sorted(changed or ()):
+        bump_data_version(name, session)
+
+
+@sa_event.listens_for(OrmSession, 'after_rollback')
+def _forget_changed_tables(session):
+    session.info.pop('changed_tables', None)
+
+
+# HTTP validators for read views. conditional_view(*tables) derives a strong
+# ETag from the route, its query string, Accept-Encoding (exports may be
+# gzipped) and the data versions of the tables
+# the page is built from (plus the code version, so deploys change it), and
+# Last-Modified from the newest of those versions. A matching
+# If-None-Match / If-Modified-Since gets a 304 after a single version
+# lookup, without running the view's queries or templates.
+def _code_version():
+    # the asset manifest too: rebuilt assets change the URLs pages link to
+    paths = [os.path.join(app.root_path, 'app.py'), os.path.join(app.static_folder, 'dist', 'manifest.json')]
+    tdir = os.path.join(app.root_path, 'templates')
+    if os.path.isdir(tdir):
+        paths += [os.path.join(tdir, n) for n in os.listdir(tdir)]
+    return str(max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0))
+
+
+CODE_VERSION = _code_version()
+
+
+def conditional_view(*tables, vary=None):
+    # vary: optional callable returning a string for request state the
+    # tables don't capture (folded into the ETag)
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            # flashed messages are one-shot, so those responses are never reused
+            if request.method != 'GET' or session.get('_flashes'):
+                return f(*args, **kwargs)
+            versions = get_data_versions(tables)
+            key = '|'.join([CODE_VERSION, request.endpoint or '', request.full_path,
+                            request.headers.get('Accept-Encoding', ''), vary() if vary else ''] +
+                           [f'{n}={versions[n][0]}' for n in sorted(versions)])
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+            stamps = [u for _, u in versions.values() if u]
+            last_modified = None
+            if stamps:
+                # HTTP dates have whole-second resolution: round the newest
+                # write up, and send no date at all until that second is
+                # over, or a later write in the same second would share it
+                # and If-Modified-Since would answer a stale 304
+                newest = datetime.fromisoformat(max(stamps))
+                last_modified = newest.replace(microsecond=0) + timedelta(seconds=bool(newest.microsecond))
+                if last_modified > datetime.utcnow():
+                    last_modified = None
+
+            not_modified = False
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            elif last_modified and request.if_modified_since:
+                not_modified = last_modified <= request.if_modified_since.replace(tzinfo=None)
+            resp = Response(status=304) if not_modified else make_response(f(*args, **kwargs))
+            if resp.status_code in (200, 304):
+                resp.set_etag(etag)
+                if last_modified:
+                    resp.last_modified = last_modified
+                # staff pages: browsers may keep a copy but must revalidate
+                resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp
+        return wrapped
+    return decorator
+
+
+# Request/SQL instrumentation. Every request is timed and the SQL it runs is
+# counted via engine events; a statement executed N_PLUS_ONE_THRESHOLD or
+# more times in one request (same SQL, different parameters) is flagged as
+# a likely N+1 loop. Each request is logged as one JSON line on the
+# 'excusal.requests' logger (WARNING when slow or N+1, INFO otherwise) and
+# aggregated per endpoint into in-process counters served by /_metrics.
+# The per-query cost is a perf_counter() pair and a dict increment, cheap
+# enough to leave on; METRICS_ENABLED=0 switches it all off.
+request_log = logging.getLogger('excusal.requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class RequestStats:
+    __slots__ = ('start', 'queries', 'sql_seconds', 'statements', 'status', '_query_start')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = Counter()
+        self.status = None
+        self._query_start = None
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()        # (endpoint, method, status) -> count
+        self.latency = {}                # (endpoint, method) -> Histogram
+        self.queries = {}                # endpoint -> Histogram of queries per request
+        self.sql_seconds = Counter()     # endpoint -> seconds spent in SQL
+        self.n_plus_one = Counter()      # endpoint -> flagged requests
+
+    def record(self, endpoint, method, stats, duration, n_plus_one):
+        with self._lock:
+            self.requests[(endpoint, method, stats.status)] += 1
+            self.latency.setdefault((endpoint, method), Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.queries.setdefault(endpoint, Histogram(QUERY_BUCKETS)).observe(stats.queries)
+            self.sql_seconds[endpoint] += stats.sql_seconds
+            if n_plus_one:
+                self.n_plus_one[endpoint] += 1
+
+    def render(self):
+        def labels(**kw):
+            return '{' + ','.join(f'{k}="{v}"' for k, v in kw.items()) + '}'
+
+        def histogram(name, hist, **kw):
+            out, total = [], 0
+            for bound, count in zip(list(hist.buckets) + ['+Inf'], hist.counts):
+                total += count
+                out.append(f'{name}_bucket{labels(**kw, le=bound)} {total}')
+            out.append(f'{name}_sum{labels(**kw)} {hist.sum:.6f}')
+            out.append(f'{name}_count{labels(**kw)} {total}')
+            return out
+
+        with self._lock:
+            lines = ['# HELP excusal_requests_total HTTP requests handled.',
+                     '# TYPE excusal_requests_total counter']
+            lines += [f'excusal_requests_total{labels(endpoint=e, method=m, status=s)} {n}'
+                      for (e, m, s), n in sorted(self.requests.items(), key=str)]
+            lines += ['# HELP excusal_request_duration_seconds Request latency, including streamed bodies.',
+                      '# TYPE excusal_request_duration_seconds histogram']
+            for (e, m), hist in sorted(self.latency.items()):
+                lines += histogram('excusal_request_duration_seconds', hist, endpoint=e, method=m)
+            lines += ['# HELP excusal_request_queries SQL statements executed per request.',
+                      '# TYPE excusal_request_queries histogram']
+            for e, hist in sorted(self.queries.items()):
+                lines += histogram('excusal_request_queries', hist, endpoint=e)
+            lines += ['# HELP excusal_sql_seconds_total Time spent executing SQL.',
+                      '# TYPE excusal_sql_seconds_total counter']
+            lines += [f'excusal_sql_seconds_total{labels(endpoint=e)} {v:.6f}' for e, v in sorted(self.sql_seconds.items())]
+            lines += ['# HELP excusal_n_plus_one_total Requests that repeated one statement N_PLUS_ONE_THRESHOLD+ times.',
+                      '# TYPE excusal_n_plus_one_total counter']
+            lines += [f'excusal_n_plus_one_total{labels(endpoint=e)} {n}' for e, n in sorted(self.n_plus_one.items())]
+        return lines
+
+
+metrics = MetricsRegistry()
+
+
+def _request_stats():
+    return g.get('_request_stats') if has_request_context() else None
+
+
+@sa_event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats()
+    if stats is not None:
+        stats._query_start = time.perf_counter()
+
+
+@sa_event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats()
+    if stats is not None and stats._query_start is not None:
+        stats.sql_seconds += time.perf_counter() - stats._query_start
+        stats._query_start = None
+        stats.queries += 1
+        stats.statements[statement] += 1
+
+
+@app.before_request
+def _start_request_stats():
+    if app.config['METRICS_ENABLED']:
+        g._request_stats = RequestStats()
+
+
+@app.after_request
+def _note_response_status(resp):
+    stats = _request_stats()
+    if stats is not None:
+        stats.status = resp.status_code
+    return resp
+
+
+# teardown runs after a stream_with_context body is exhausted, so exports
+# are timed end to end
+@app.teardown_request
+def _finish_request_stats(exc):
+    stats = g.pop('_request_stats', None)
+    if stats is None:
+        return
+    duration = time.perf_counter() - stats.start
+    if stats.status is None:
+        stats.status = 500
+    endpoint = request.endpoint or 'none'
+    repeated = [(sql, n) for sql, n in stats.statements.most_common(3) if n >= app.config['N_PLUS_ONE_THRESHOLD']]
+    metrics.record(endpoint, request.method, stats, duration, bool(repeated))
+
+    slow = duration * 1000 >= app.config['SLOW_REQUEST_MS']
+    level = logging.WARNING if slow or repeated else logging.INFO
+    if request_log.isEnabledFor(level):
+        record = {'event': 'request', 'method': request.method, 'path': request.path, 'endpoint': endpoint,
+                  'status': stats.status, 'duration_ms': round(duration * 1000, 2),
+                  'queries': stats.queries, 'sql_ms': round(stats.sql_seconds * 1000, 2)}
+        if slow:
+            record['slow'] = True
+        if repeated:
+            record['n_plus_one'] = [{'count': n, 'statement': ' '.join(sql.split())[:200]} for sql, n in repeated]
+        request_log.log(level, json.dumps(record))
+
+
+# Serve a GET view's reads from the replica when one is configured (stacked
+# outside conditional_view so the version lookup reads the same database).
+# The replica may lag the primary slightly; only use this on pages where
+# that is acceptable.
+def read_replica(f):
+    @wraps(f)
+    def wrapped(*args, **kwargs):
+        if request.method in ('GET', 'HEAD') and 'replica' in db.engines:
+            g.use_replica = True
+        return f(*args, **kwargs)
+    return wrapped
 
 
 # Landing page
@@ -71,12 +618,1147 @@ def normalize_name(n: str) -> str:
     return (n or "").strip().lower()
 
 
+# helper: look up a cadet by name (case-insensitive) via the indexed column
+def find_cadet_by_name(name):
+    norm = normalize_name(name)
+    if not norm:
+        return None
+    return Cadet.query.filter_by(name_normalized=norm).first()
+
+
+def find_cadets_by_names(names):
+    """{normalized name: CadetRow} for the given names found on the roster
+    (one query per 500 distinct names)."""
+    norms = sorted({normalize_name(n) for n in names} - {''})
+    found = {}
+    for chunk in _chunks(norms):
+        for cadet_id, name, rank, norm in (db.session.query(Cadet.id, Cadet.name, Cadet.rank, Cadet.name_normalized)
+                                           .filter(Cadet.name_normalized.in_(chunk)).order_by(Cadet.id)):
+            found.setdefault(norm, CadetRow(cadet_id, name, rank))
+    return found
+
+
+# helper: the event an excusal form refers to. The dropdown posts event_id;
+# the free-text fallback (used when no events exist) only has excused_from.
+def event_from_form(form):
+    ev = None
+    ev_id = form.get('event_id', type=int)
+    if ev_id:
+        ev = Event.query.get(ev_id)
+    if ev:
+        return ev, ev.name
+    return None, form.get('excused_from', '').strip()
+
+
+def roster_csv_path():
+    return app.config['ROSTER_CSV_PATH']
+
+
+# Event catalog: per-process cache of the event list, sorted by date and
+# split into upcoming/past. Each read costs one primary-key lookup of the
+# 'event' data version; when another worker (or this one) has written the
+# event table the version differs and the lists are reloaded. A cold load only
+# fetches the half it needs, with the split done in the SQL WHERE clause,
+# and a new day re-splits the cached lists without touching the database.
+# Archived events are left out: the live pages only deal with hot data.
+EventInfo = namedtuple('EventInfo', 'id name date')
+
+
+class EventCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._upcoming = None
+        self._past = None
+        self._today = None
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def _query(self, clause):
+        rows = (db.session.query(Event.id, Event.name, Event.date)
+                .filter(clause, Event.archived_at.is_(None)).order_by(Event.date, Event.id).all())
+        return [EventInfo(*r) for r in rows]
+
+    def _lists(self, need_past):
+        version = get_data_version('event')
+        today_s = date.today().isoformat()
+        with self._lock:
+            if self._version != version:
+                self._version, self._today = version, today_s
+                self._upcoming = self._past = None
+            elif self._today != today_s:
+                # date rolled over: events from yesterday move to past
+                if self._upcoming is not None:
+                    moved = [e for e in self._upcoming if e.date < today_s]
+                    self._upcoming = [e for e in self._upcoming if e.date >= today_s]
+                    if self._past is not None:
+                        self._past = self._past + moved
+                else:
+                    self._past = None
+                self._today = today_s
+            upcoming, past = self._upcoming, self._past
+
+        if upcoming is None:
+            upcoming = self._query(Event.date >= today_s)
+        if need_past and past is None:
+            past = self._query(Event.date < today_s)
+        with self._lock:
+            if self._version == version and self._today == today_s:
+                self._upcoming = upcoming
+                if past is not None:
+                    self._past = past
+        return upcoming, past
+
+    def upcoming(self):
+        return self._lists(need_past=False)[0]
+
+    def past(self):
+        return self._lists(need_past=True)[1]
+
+    def all(self):
+        upcoming, past = self._lists(need_past=True)
+        return past + upcoming
+
+    def get(self, event_id):
+        for e in self.all():
+            if e.id == event_id:
+                return e
+        return None
+
+
+event_catalog = EventCatalog()
+
+
+# Roster name index for fuzzy matching: character trigrams of each word of
+# a cadet's name (pg_trgm style, words padded with two leading blanks and
+# one trailing one) mapped to cadet ids, built per process from one query.
+# Like EventCatalog it is checked against the 'roster' data version and
+# reloaded when another worker changed the roster, but at most every
+# VERSION_TTL seconds so autocomplete keystrokes don't each cost a query;
+# roster() edits in this process are applied to it incrementally.
+# A lookup counts shared trigrams over the query's posting lists and scores
+# only the best-counted names. When the lists are huge (very common name
+# fragments) they are walked rarest first and, once MAX_CANDIDATES names
+# have been found, the remaining lists only add to those.
+_WORD_RE = re.compile(r'[^\W_]+')
+RosterMatch = namedtuple('RosterMatch', 'id name score')
+
+
+def name_trigrams(name, prefix=False):
+    # prefix=True leaves the last word open so a partially typed name matches
+    words = _WORD_RE.findall((name or '').lower())
+    grams = set()
+    for i, w in enumerate(words):
+        padded = '  ' + w + ('' if prefix and i == len(words) - 1 else ' ')
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+class RosterIndex:
+    MIN_SCORE = 0.3
+    MAX_CANDIDATES = 500
+    MAX_SCAN = 20000
+    VERSION_TTL = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._names = {}                    # cadet id -> (name, trigram set)
+        self._postings = defaultdict(set)   # trigram -> set of cadet ids
+
+    def _add(self, cadet_id, name):
+        grams = name_trigrams(name)
+        self._names[cadet_id] = (name, grams)
+        postings = self._postings
+        for g in grams:
+            postings[g].add(cadet_id)
+
+    def _remove(self, cadet_id):
+        entry = self._names.pop(cadet_id, None)
+        if entry:
+            for g in entry[1]:
+                ids = self._postings.get(g)
+                if ids is not None:
+                    ids.discard(cadet_id)
+                    if not ids:
+                        del self._postings[g]
+
+    def _ensure(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.VERSION_TTL:
+            return
+        version = get_data_version('roster')
+        self._checked_at = now
+        with self._lock:
+            if self._version == version:
+                return
+        rows = db.session.query(Cadet.id, Cadet.name).all()
+        with self._lock:
+            self._names, self._postings = {}, defaultdict(set)
+            for cadet_id, name in rows:
+                self._add(cadet_id, name)
+            self._version = version
+
+    # incremental updates, called after the roster change was committed
+    def _apply(self, fn):
+        version = get_data_version('roster')
+        with self._lock:
+            if self._version is None:
+                return
+            fn()
+            # anything beyond our own commit means another writer got in between
+            self._version = version if version - self._version <= 1 else None
+
+    def add(self, cadet_id, name):
+        self._apply(lambda: self._add(cadet_id, name))
+
+    def remove(self, cadet_id):
+        self._apply(lambda: self._remove(cadet_id))
+
+    def rename(self, cadet_id, name):
+        def change():
+            self._remove(cadet_id)
+            self._add(cadet_id, name)
+        self._apply(change)
+
+    def suggest(self, query, limit=8, prefix=True):
+        """Best matching cadets for a (possibly partial or misspelled) name."""
+        q = name_trigrams(query, prefix=prefix)
+        if not q:
+            return []
+        self._ensure()
+        with self._lock:
+            postings = sorted((self._postings.get(g, ()) for g in q), key=len)
+            capped = sum(map(len, postings)) > self.MAX_SCAN
+            hits = Counter()
+            for ids in postings:
+                hits.update(hits.keys() & ids if capped and len(hits) >= self.MAX_CANDIDATES else ids)
+            scored = []
+            for cadet_id, shared in heapq.nlargest(limit * 4, hits.items(), key=itemgetter(1)):
+                name, grams = self._names[cadet_id]
+                # mostly "how much of what was typed is in the name", with
+                # overall similarity breaking ties between longer and shorter names
+                score = 0.8 * shared / len(q) + 0.2 * shared / (len(q) + len(grams) - shared)
+                if score >= self.MIN_SCORE:
+                    scored.append(RosterMatch(cadet_id, name, round(score, 3)))
+        scored.sort(key=lambda m: (-m.score, m.name))
+        return scored[:limit]
+
+
+roster_index = RosterIndex()
+
+
+# Write-behind mirror of roster edits into roster.csv.
+# Requests only append one line to roster.csv.journal; a background timer
+# (shared by all edits in the next few seconds) replays the journal onto
+# roster.csv with a temp file + rename. Appends and compactions take an
+# flock on roster.csv.lock, so gunicorn workers never lose each other's
+# changes, and any worker's flusher picks up journal lines left by another.
+class RosterCsvJournal:
+    def __init__(self, path_fn, delay_fn):
+        self._path_fn = path_fn
+        self._delay_fn = delay_fn
+        self._timer = None
+        self._mutex = threading.Lock()
+
+    @property
+    def csv_path(self):
+        return self._path_fn()
+
+    @property
+    def journal_path(self):
+        return self.csv_path + '.journal'
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.csv_path + '.lock', 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, op, *names):
+        line = json.dumps([op] + list(names)) + '\n'
+        with self._file_lock():
+            with open(self.journal_path, 'a') as f:
+                f.write(line)
+        self._schedule()
+
+    def _schedule(self):
+        with self._mutex:
+            if self._timer is None:
+                self._timer = threading.Timer(self._delay_fn(), self._timer_flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timer_flush(self):
+        with self._mutex:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            app.logger.exception('Flushing roster journal failed')
+
+    def flush(self):
+        """Apply every journaled change to roster.csv; returns the number applied."""
+        with self._file_lock():
+            if not os.path.exists(self.journal_path):
+                return 0
+            with open(self.journal_path) as f:
+                ops = [json.loads(line) for line in f if line.strip()]
+            if not ops:
+                return 0
+
+            names = {}
+            if os.path.exists(self.csv_path):
+                with open(self.csv_path, newline='') as f:
+                    for row in csv.DictReader(f):
+                        n = (row.get('names') or '').strip()
+                        if n:
+                            names[normalize_name(n)] = n
+            for op in ops:
+                if op[0] == 'add':
+                    names.setdefault(normalize_name(op[1]), op[1])
+                elif op[0] == 'delete':
+                    names.pop(normalize_name(op[1]), None)
+                elif op[0] == 'rename':
+                    names.pop(normalize_name(op[1]), None)
+                    names[normalize_name(op[2])] = op[2]
+
+            tmp_path = f'{self.csv_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['names'])
+                for n in sorted(names.values()):
+                    writer.writerow([n])
+            os.replace(tmp_path, self.csv_path)
+            # journal is only truncated once roster.csv has been replaced
+            open(self.journal_path, 'w').close()
+            return len(ops)
+
+
+roster_journal = RosterCsvJournal(roster_csv_path, lambda: app.config['ROSTER_JOURNAL_FLUSH_DELAY'])
+
+
+@atexit.register
+def _flush_roster_journal_at_exit():
+    try:
+        roster_journal.flush()
+    except Exception:
+        pass
+
+
+@app.cli.command('flush-roster-journal')
+def flush_roster_journal_command():
+    """Apply pending roster edits to roster.csv now."""
+    click.echo(f'applied {roster_journal.flush()} journaled roster changes')
+
+
+# Roster import/sync from roster.csv.
+# The CSV is streamed, deduped in memory by normalized name and diffed
+# against the whole roster fetched in one query; the resulting inserts,
+# renames and deletes are applied as executemany statements in a single
+# transaction.
+def iter_roster_csv(path):
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            name = (row.get('names') or row.get('name') or row.get('Name') or '').strip()
+            if name:
+                yield name
+
+
+def _chunks(seq, size=500):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def sync_roster(path, delete_missing=False, rename=False, dry_run=False):
+    """Sync the cadet table with a roster CSV and return a summary dict.
+
+    New names are always added. With rename=True cadets whose name only
+    differs in capitalization/spacing take the CSV spelling, and with
+    delete_missing=True cadets absent from the CSV are removed (along with
+    their attendance overrides; their excusals are kept but unlinked). dry_run computes the summary only.
+    """
+    wanted = {}
+    for name in iter_roster_csv(path):
+        wanted.setdefault(normalize_name(name), name)
+
+    existing = {}
+    for cid, name, norm in db.session.query(Cadet.id, Cadet.name, Cadet.name_normalized):
+        existing.setdefault(norm or normalize_name(name), (cid, name))
+
+    to_add = [{'name': name, 'name_normalized': norm, 'rank': '', 'status': 'present'}
+              for norm, name in wanted.items() if norm not in existing]
+    to_rename = [{'id': cid, 'name': wanted[norm]}
+                 for norm, (cid, name) in existing.items() if norm in wanted and wanted[norm] != name]
+    to_delete = [cid for norm, (cid, name) in existing.items() if norm not in wanted]
+
+    summary = {
+        'added': len(to_add),
+        'renamed': len(to_rename) if rename else 0,
+        'removed': len(to_delete) if delete_missing else 0,
+        'unchanged': len(existing) - (len(to_rename) if rename else 0) - (len(to_delete) if delete_missing else 0),
+        'dry_run': dry_run,
+    }
+    if dry_run:
+        return summary
+
+    try:
+        if to_add:
+            db.session.execute(db.insert(Cadet), to_add)
+            db.session.execute(db.update(EventAttendanceSummary).where(live_event_summaries())
+                               .values(present=EventAttendanceSummary.present + len(to_add)))
+        if rename and to_rename:
+            db.session.execute(db.update(Cadet), to_rename)
+        if delete_missing and to_delete:
+            for ids in _chunks(to_delete):
+                db.session.execute(db.update(Excusal).where(Excusal.cadet_id.in_(ids)).values(cadet_id=None))
+                db.session.execute(db.delete(AttendanceOverride).where(AttendanceOverride.cadet_id.in_(ids)))
+                db.session.execute(db.delete(Cadet).where(Cadet.id.in_(ids)))
+            recount_event_summaries()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return summary
+
+
+@app.cli.command('sync-roster')
+@click.option('--path', default=None, help='CSV to import (defaults to ROSTER_CSV_PATH).')
+@click.option('--delete-missing', is_flag=True, help='Remove cadets not listed in the CSV.')
+@click.option('--rename', is_flag=True, help='Apply capitalization/spacing changes from the CSV.')
+@click.option('--dry-run', is_flag=True, help='Only report what would change.')
+def sync_roster_command(path, delete_missing, rename, dry_run):
+    """Import roster.csv into the cadet table."""
+    if not path:
+        roster_journal.flush()
+    summary = sync_roster(path or roster_csv_path(), delete_missing=delete_missing, rename=rename, dry_run=dry_run)
+    click.echo(' '.join(f'{k}={v}' for k, v in summary.items()))
+
+
+# helper: map an excusal status onto the attendance status staff see
+def excusal_attendance_status(exc_status):
+    if exc_status == 'pending':
+        return 'pending'
+    if exc_status in ('approved', 'excused'):
+        return 'excused'
+    return 'present'
+
+
+# Attendance resolution: final status for every cadet for one event.
+# Precedence is override > latest excusal > present. Two set-based queries
+# do the work regardless of roster size: the event's "latest excusal per
+# cadet" (a row_number() window) is loaded into a dict, then the roster is
+# read joined to its overrides (unique per cadet/event). iter_attendance()
+# streams the rows (used by the CSV export); resolve_attendance() returns
+# them as a list. Archived events are resolved from the archive tables.
+CadetRow = namedtuple('CadetRow', 'id name rank')
+
+
+def attendance_models(archived=False):
+    """(excusal, override) models holding a live or an archived event's rows."""
+    if archived:
+        return ExcusalArchive, AttendanceOverrideArchive
+    return Excusal, AttendanceOverride
+
+
+def resolve_attendance(event, archived=False):
+    return list(iter_attendance(event, archived=archived))
+
+
+def iter_attendance(event, yield_per=None, archived=False):
+    if event is None:
+        q = db.session.query(Cadet.id, Cadet.name, Cadet.rank).order_by(Cadet.name)
+        if yield_per:
+            q = q.execution_options(yield_per=yield_per)
+        for c in q:
+            yield {'cadet': CadetRow(*c), 'status': 'present', 'excusal_date': '', 'excusal_reason': ''}
+        return
+
+    exc_model, ov_model = attendance_models(archived)
+    exc = (db.session.query(
+            exc_model.cadet_id.label('cadet_id'),
+            exc_model.status.label('status'),
+            exc_model.date.label('date'),
+            exc_model.reason.label('reason'),
+            db.func.row_number().over(
+                partition_by=exc_model.cadet_id,
+                order_by=(exc_model.date.desc(), exc_model.id.desc())).label('rn'))
+           .filter(exc_model.event_id == event.id)
+           .subquery())
+    latest = {cadet_id: (status, d, reason) for cadet_id, status, d, reason in
+              db.session.query(exc.c.cadet_id, exc.c.status, exc.c.date, exc.c.reason).filter(exc.c.rn == 1)}
+
+    q = (db.session.query(Cadet.id, Cadet.name, Cadet.rank, ov_model.status)
+         .outerjoin(ov_model, db.and_(ov_model.cadet_id == Cadet.id,
+                                      ov_model.event_id == event.id))
+         .order_by(Cadet.name))
+    if yield_per:
+        q = q.execution_options(yield_per=yield_per)
+
+    # 'cadet' is a lightweight (id, name, rank) row rather than an ORM object
+    for cadet_id, name, rank, ov_status in q:
+        c = CadetRow(cadet_id, name, rank)
+        exc_row = latest.get(cadet_id)
+        if ov_status is not None:
+            yield {'cadet': c, 'status': ov_status, 'excusal_date': '', 'excusal_reason': ''}
+        elif exc_row is not None:
+            exc_status, exc_date, exc_reason = exc_row
+            yield {'cadet': c, 'status': excusal_attendance_status(exc_status),
+                   'excusal_date': exc_date or '', 'excusal_reason': exc_reason or ''}
+        else:
+            yield {'cadet': c, 'status': 'present', 'excusal_date': '', 'excusal_reason': ''}
+
+
+# Rendered-fragment cache for the whoiscoming attendance table. Entries are
+# grouped by event and tagged with the data versions the table depends on,
+# so a stale entry is never served and storing a fresh one replaces it.
+# The least recently used events are evicted past FRAGMENT_CACHE_SIZE.
+# FRAGMENT_CACHE_URL picks the backend: 'memory' (per process, default) or
+# 'sqlite:///path/to/cache.db' to share one cache between gunicorn workers.
+class MemoryFragmentBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, group):
+        with self._lock:
+            entry = self._entries.get(group)
+            if entry is not None:
+                self._entries.move_to_end(group)
+            return entry
+
+    def set(self, group, tag, value):
+        with self._lock:
+            self._entries[group] = (tag, value)
+            self._entries.move_to_end(group)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteFragmentBackend:
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS fragment '
+                         '(grp TEXT PRIMARY KEY, tag TEXT NOT NULL, value TEXT NOT NULL, last_used REAL NOT NULL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, group):
+        with self._connect() as conn:
+            row = conn.execute('SELECT tag, value FROM fragment WHERE grp = ?', (group,)).fetchone()
+            if row is not None:
+                conn.execute('UPDATE fragment SET last_used = ? WHERE grp = ?', (time.time(), group))
+        return tuple(row) if row else None
+
+    def set(self, group, tag, value):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO fragment (grp, tag, value, last_used) VALUES (?, ?, ?, ?)',
+                         (group, tag, value, time.time()))
+            conn.execute('DELETE FROM fragment WHERE grp IN (SELECT grp FROM fragment '
+                         'ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM fragment').fetchone()[0]
+
+
+class FragmentCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, group, tag, render):
+        entry = self.backend.get(group)
+        if entry is not None and entry[0] == tag:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = render()
+        self.backend.set(group, tag, value)
+        return value
+
+    def stats(self):
+        return {'backend': type(self.backend).__name__, 'entries': len(self.backend),
+                'hits': self.hits, 'misses': self.misses}
+
+
+_fragment_cache = None
+
+
+def fragment_cache():
+    global _fragment_cache
+    if _fragment_cache is None:
+        url = app.config['FRAGMENT_CACHE_URL']
+        size = app.config['FRAGMENT_CACHE_SIZE']
+        if url.startswith('sqlite:///'):
+            backend = SQLiteFragmentBackend(url[len('sqlite:///'):], size)
+        else:
+            backend = MemoryFragmentBackend(size)
+        _fragment_cache = FragmentCache(backend)
+    return _fragment_cache
+
+
+def render_attendance_table(sel_event):
+    if sel_event is None:
+        return Markup(render_template('_attendance_table.html', cadet_rows=resolve_attendance(None), sel_event=None))
+    names = ['roster', 'attendance', f'attendance:{sel_event.id}']
+    versions = get_data_versions(names)
+    tag = '|'.join([CODE_VERSION] + [f'{n}={versions[n][0]}' for n in names])
+    html = fragment_cache().get_or_render(
+        f'whoiscoming:{sel_event.id}', tag,
+        lambda: render_template('_attendance_table.html', cadet_rows=resolve_attendance(sel_event), sel_event=sel_event))
+    return Markup(html)
+
+
+# Attendance matrix: cadets x events status grid, used by /attendance_matrix.
+# Statuses are stored as small integer codes in one flat array (row-major,
+# one row per cadet) instead of nested dicts.
+ATTENDANCE_STATUSES = ('present', 'pending', 'excused', 'unknown')
+ATTENDANCE_CODES = {s: i for i, s in enumerate(ATTENDANCE_STATUSES)}
+
+
+def build_attendance_matrix(events, archived_ids=()):
+    """Return (cadets, events, grid) for the given events.
+
+    cadets is a list of (id, name, rank) tuples ordered by name and grid is an
+    array('b') of len(cadets) * len(events) status codes. Events whose id is
+    in archived_ids are read from the archive tables; each kind of event
+    costs two queries on top of the roster one.
+    """
+    events = list(events)
+    cadets = db.session.query(Cadet.id, Cadet.name, Cadet.rank).order_by(Cadet.name).all()
+    n_events = len(events)
+    grid = array('b', bytes(len(cadets) * n_events))  # all present (code 0)
+    if not cadets or not events:
+        return cadets, events, grid
+
+    row_of_id = {c.id: i for i, c in enumerate(cadets)}
+    col_of_id = {e.id: j for j, e in enumerate(events)}
+    archived_ids = set(archived_ids)
+    live = [e for e in col_of_id if e not in archived_ids]
+    cold = [e for e in col_of_id if e in archived_ids]
+
+    for event_ids, archived in ((live, False), (cold, True)):
+        if not event_ids:
+            continue
+        exc_model, ov_model = attendance_models(archived)
+        latest = (db.session.query(
+                    exc_model.cadet_id.label('cadet_id'),
+                    exc_model.event_id.label('event_id'),
+                    exc_model.status.label('status'),
+                    db.func.row_number().over(
+                        partition_by=(exc_model.cadet_id, exc_model.event_id),
+                        order_by=(exc_model.date.desc(), exc_model.id.desc())).label('rn'))
+                  .filter(exc_model.event_id.in_(event_ids))
+                  .subquery())
+        for cadet_id, event_id, status in db.session.query(latest.c.cadet_id, latest.c.event_id, latest.c.status).filter(latest.c.rn == 1):
+            i = row_of_id.get(cadet_id)
+            if i is None:
+                continue
+            grid[i * n_events + col_of_id[event_id]] = ATTENDANCE_CODES[excusal_attendance_status(status)]
+
+        # overrides win over excusals
+        overrides = (db.session.query(ov_model.cadet_id, ov_model.event_id, ov_model.status)
+                     .filter(ov_model.event_id.in_(event_ids)))
+        for cadet_id, event_id, status in overrides:
+            i = row_of_id.get(cadet_id)
+            if i is None:
+                continue
+            grid[i * n_events + col_of_id[event_id]] = ATTENDANCE_CODES.get(status, ATTENDANCE_CODES['unknown'])
+
+    return cadets, events, grid
+
+
+# Attendance summary: event_attendance_summary keeps present/pending/
+# excused/unknown headcounts per event so pages can show them without
+# resolving every cadet. Single-cadet writes (submit/edit/approve/override)
+# run inside attendance_summary_delta(), which resolves the touched
+# (cadet, event) pairs before and after the change and adds the difference.
+# Bulk writes call recount_event_summaries() for the events they touched,
+# and 'flask rebuild-attendance-summary' repairs any drift.
+def attendance_statuses(pairs):
+    """Resolved status for each (cadet_id, event_id) pair, in two queries."""
+    pairs = {(int(c), int(e)) for c, e in pairs}
+    if not pairs:
+        return {}
+    cadet_ids = {c for c, _ in pairs}
+    event_ids = {e for _, e in pairs}
+    statuses = dict.fromkeys(pairs, 'present')
+
+    latest = (db.session.query(
+                Excusal.cadet_id.label('cadet_id'),
+                Excusal.event_id.label('event_id'),
+                Excusal.status.label('status'),
+                db.func.row_number().over(
+                    partition_by=(Excusal.cadet_id, Excusal.event_id),
+                    order_by=(Excusal.date.desc(), Excusal.id.desc())).label('rn'))
+              .filter(Excusal.cadet_id.in_(cadet_ids), Excusal.event_id.in_(event_ids))
+              .subquery())
+    for c, e, status in db.session.query(latest.c.cadet_id, latest.c.event_id, latest.c.status).filter(latest.c.rn == 1):
+        if (c, e) in statuses:
+            statuses[(c, e)] = excusal_attendance_status(status)
+    overrides = (db.session.query(AttendanceOverride.cadet_id, AttendanceOverride.event_id, AttendanceOverride.status)
+                 .filter(AttendanceOverride.cadet_id.in_(cadet_ids), AttendanceOverride.event_id.in_(event_ids)))
+    for c, e, status in overrides:
+        if (c, e) in statuses:
+            statuses[(c, e)] = status if status in ATTENDANCE_CODES else 'unknown'
+    return statuses
+
+
+def _summary_bucket(status):
+    return status if status in ATTENDANCE_CODES else 'unknown'
+
+
+def apply_summary_delta(deltas):
+    """deltas maps event_id -> Counter of status -> change in headcount.
+
+    Events sharing a delta (e.g. every event a deleted cadet was present
+    at) are updated by one statement."""
+    groups = defaultdict(list)
+    for event_id, delta in deltas.items():
+        key = tuple(sorted((k, v) for k, v in delta.items() if v))
+        if key:
+            groups[key].append(event_id)
+    missing = []
+    for key, event_ids in groups.items():
+        values = {k: getattr(EventAttendanceSummary, k) + v for k, v in key}
+        updated = db.session.execute(
+            db.update(EventAttendanceSummary).where(EventAttendanceSummary.event_id.in_(event_ids)).values(**values)).rowcount
+        if updated < len(event_ids):
+            found = {e for (e,) in db.session.query(EventAttendanceSummary.event_id)
+                     .filter(EventAttendanceSummary.event_id.in_(event_ids))}
+            missing.extend(e for e in event_ids if e not in found)
+    if missing:
+        recount_event_summaries(missing)
+
+
+# Keeps the headcounts in step with a change to the given pairs. The
+# yielded dict is filled on exit with {(cadet_id, event_id): (old, new)}
+# for every pair whose resolved status changed.
+@contextmanager
+def attendance_summary_delta(pairs):
+    pairs = [(c, e) for c, e in pairs if c and e]
+    before = attendance_statuses(pairs)
+    changed = {}
+    yield changed
+    db.session.flush()
+    after = attendance_statuses(pairs)
+    deltas = {}
+    for pair, old in before.items():
+        new = after[pair]
+        if old != new:
+            changed[pair] = (old, new)
+            d = deltas.setdefault(pair[1], Counter())
+            d[_summary_bucket(old)] -= 1
+            d[_summary_bucket(new)] += 1
+    apply_summary_delta(deltas)
+
+
+# archived events' headcounts are frozen (see "Archival" below): roster
+# changes and full recounts only touch the summaries of live events
+def live_event_summaries():
+    return EventAttendanceSummary.event_id.in_(db.select(Event.id).where(Event.archived_at.is_(None)))
+
+
+def count_event_statuses(event_ids=None, include_archived=False):
+    """Headcount rows ({'event_id': id, 'present': n, ...}) computed from the
+    attendance tables, for the given events or as recount_event_summaries()
+    selects them."""
+    if event_ids is not None and not event_ids:
+        return []
+    q = db.session.query(Event.id, Event.name, Event.date, Event.archived_at)
+    if event_ids is not None:
+        q = q.filter(Event.id.in_(event_ids))
+    elif not include_archived:
+        q = q.filter(Event.archived_at.is_(None))
+    rows = q.all()
+    evs = [EventInfo(r.id, r.name, r.date) for r in rows]
+    cadets, evs, grid = build_attendance_matrix(evs, archived_ids=[r.id for r in rows if r.archived_at])
+    n_events = len(evs)
+    counted = []
+    for j, e in enumerate(evs):
+        counts = Counter(ATTENDANCE_STATUSES[grid[i * n_events + j]] for i in range(len(cadets)))
+        counted.append({'event_id': e.id, **{s_: counts.get(s_, 0) for s_ in ATTENDANCE_STATUSES}})
+    return counted
+
+
+def recount_event_summaries(event_ids=None, include_archived=False):
+    """Recompute headcounts from scratch for the given events (if None, all
+    live events, plus the archived ones with include_archived)."""
+    if event_ids is not None:
+        event_ids = [int(e) for e in event_ids]
+        if not event_ids:
+            return
+    rows = count_event_statuses(event_ids, include_archived)
+    delete = db.delete(EventAttendanceSummary)
+    if event_ids is not None:
+        delete = delete.where(EventAttendanceSummary.event_id.in_(event_ids))
+    elif not include_archived:
+        delete = delete.where(live_event_summaries())
+    db.session.execute(delete)
+    if rows:
+        db.session.execute(db.insert(EventAttendanceSummary), rows)
+
+
+def event_headcounts(event_ids):
+    """{event_id: {'present': n, ...}} read from the summary table."""
+    event_ids = [int(e) for e in event_ids]
+    if not event_ids:
+        return {}
+    counts = {r.event_id: {s_: getattr(r, s_) for s_ in ATTENDANCE_STATUSES}
+              for r in EventAttendanceSummary.query.filter(EventAttendanceSummary.event_id.in_(event_ids))}
+    missing = [e for e in event_ids if e not in counts]
+    if missing:
+        # not filled in yet (migrate_db() adds missing rows): count them
+        # here without writing, so read-only pages stay read-only
+        for row in count_event_statuses(missing):
+            counts[row.pop('event_id')] = row
+    return counts
+
+
+def fill_missing_event_summaries():
+    """Add summary rows for events that have none; returns how many."""
+    missing = [e for (e,) in db.session.query(Event.id)
+               .outerjoin(EventAttendanceSummary, EventAttendanceSummary.event_id == Event.id)
+               .filter(EventAttendanceSummary.event_id.is_(None))]
+    if missing:
+        recount_event_summaries(missing)
+        db.session.commit()
+    return len(missing)
+
+
+@app.cli.command('rebuild-attendance-summary')
+@click.option('--include-archived', is_flag=True,
+              help='Also recompute archived events from the archive tables and the current roster.')
+def rebuild_attendance_summary_command(include_archived):
+    """Recompute every live event's attendance headcounts."""
+    recount_event_summaries(include_archived=include_archived)
+    db.session.commit()
+    click.echo(f'rebuilt attendance summary for {EventAttendanceSummary.query.count()} events')
+
+
+# Archival: excusals and overrides of events older than
+# ARCHIVE_RETENTION_DAYS move to excusal_archive /
+# attendance_override_archive so the live tables (and every page and index
+# built on them) only hold hot data. Each event moves as a unit in its own
+# transaction -- INSERT ... SELECT into the archive, DELETE from the live
+# table, stamp event.archived_at -- so an interrupted run leaves every
+# event either fully live or fully archived, and the next run just carries
+# on. Events that still have pending excusals stay live until they are
+# moderated. Excusals not linked to an event are archived by their own
+# date, in id-ordered batches. The event's headcounts in
+# event_attendance_summary are frozen as they were when it was archived:
+# adding or removing cadets afterwards and full recounts leave them alone
+# (live_event_summaries()), and only `flask rebuild-attendance-summary
+# --include-archived` recomputes them, from the archive tables against the
+# current roster. Exports read the archive only when asked to with
+# include_archived=1.
+def archive_cutoff(retention_days=None):
+    if retention_days is None:
+        retention_days = app.config['ARCHIVE_RETENTION_DAYS']
+    return (date.today() - timedelta(days=retention_days)).isoformat()
+
+
+def _move_to_archive(model, archive_model, criteria, now, event_ids=None):
+    """Copy the rows matching criteria into archive_model, delete them from
+    model and return how many were moved."""
+    columns = [c.name for c in model.__table__.columns]
+    rows = (db.select(*[getattr(model, c) for c in columns], db.literal(now))
+            .where(*criteria)
+            .where(~db.exists().where(archive_model.id == model.id)))
+    options = {'synchronize_session': False}
+    if event_ids is not None:
+        options['attendance_events'] = event_ids
+    db.session.execute(db.insert(archive_model).from_select(columns + ['archived_at'], rows))
+    return db.session.execute(db.delete(model).where(*criteria), execution_options=options).rowcount
+
+
+def archive_past_events(cutoff=None, limit=None, batch_size=500, dry_run=False):
+    """Archive events dated before cutoff (default: ARCHIVE_RETENTION_DAYS
+    ago) and return a summary dict. limit caps the number of events moved
+    per run; dry_run only counts."""
+    cutoff = cutoff or archive_cutoff()
+    has_live_rows = db.or_(
+        db.exists().where(Excusal.event_id == Event.id),
+        db.exists().where(AttendanceOverride.event_id == Event.id))
+    candidates = (db.session.query(Event.id)
+                  .filter(Event.date < cutoff, db.or_(Event.archived_at.is_(None), has_live_rows))
+                  .order_by(Event.date, Event.id))
+    candidate_ids = [e for e, in candidates]
+    waiting = set()
+    for ids in _chunks(candidate_ids):
+        waiting.update(e for e, in db.session.query(Excusal.event_id).filter(
+            Excusal.status == 'pending', Excusal.event_id.in_(ids)).distinct())
+    event_ids = [e for e in candidate_ids if e not in waiting]
+    if limit is not None:
+        event_ids = event_ids[:limit]
+    loose = (db.session.query(Excusal.id)
+             .filter(Excusal.event_id.is_(None), Excusal.date < cutoff, Excusal.status != 'pending'))
+    summary = {'cutoff': cutoff, 'events': len(event_ids), 'excusals': 0, 'overrides': 0,
+               'skipped_pending': len(waiting), 'dry_run': dry_run}
+
+    if dry_run:
+        if event_ids:
+            for ids in _chunks(event_ids):
+                summary['excusals'] += Excusal.query.filter(Excusal.event_id.in_(ids)).count()
+                summary['overrides'] += AttendanceOverride.query.filter(AttendanceOverride.event_id.in_(ids)).count()
+        summary['excusals'] += loose.count()
+        return summary
+
+    for event_id in event_ids:
+        try:
+            # headcounts must exist before the rows they are counted from move
+            if db.session.get(EventAttendanceSummary, event_id) is None:
+                recount_event_summaries([event_id])
+            now = datetime.utcnow().isoformat()
+            summary['excusals'] += _move_to_archive(Excusal, ExcusalArchive, [Excusal.event_id == event_id],
+                                                    now, event_ids=[event_id])
+            summary['overrides'] += _move_to_archive(AttendanceOverride, AttendanceOverrideArchive,
+                                                     [AttendanceOverride.event_id == event_id], now,
+                                                     event_ids=[event_id])
+            db.session.execute(db.update(Event).where(Event.id == event_id, Event.archived_at.is_(None))
+                               .values(archived_at=now))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    while True:
+        ids = [i for i, in loose.order_by(Excusal.id).limit(batch_size)]
+        if not ids:
+            break
+        try:
+            summary['excusals'] += _move_to_archive(Excusal, ExcusalArchive, [Excusal.id.in_(ids)],
+                                                    datetime.utcnow().isoformat(), event_ids=[])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    if event_ids:
+        event_catalog.invalidate()
+    return summary
+
+
+@app.cli.command('archive')
+@click.option('--retention-days', type=int, default=None,
+              help='Archive events older than this many days (defaults to ARCHIVE_RETENTION_DAYS).')
+@click.option('--limit', type=int, default=None, help='Archive at most this many events in this run.')
+@click.option('--dry-run', is_flag=True, help='Only report what would be archived.')
+def archive_command(retention_days, limit, dry_run):
+    """Move excusals and overrides of past events into the archive tables."""
+    summary = archive_past_events(archive_cutoff(retention_days), limit=limit, dry_run=dry_run)
+    click.echo(' '.join(f'{k}={v}' for k, v in summary.items()))
+
+
 @app.context_processor
 def inject_now():
     # make today's date available to templates in YYYY-MM-DD
     return {"today": date.today().isoformat()}
 
 
+# Schema migrations.
+# create_all() only creates missing tables, so every change to an existing
+# table is a numbered migration below. migrate_db() runs create_all() and
+# then each migration newer than the highest version recorded in
+# schema_version, all in one transaction. Because create_all() already
+# builds new databases at the latest schema, migrations must be idempotent
+# (check before adding columns, CREATE INDEX IF NOT EXISTS, ...).
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200))
+    applied_at = db.Column(db.String(40))
+
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def _has_column(conn, table, column):
+    return column in {c['name'] for c in db.inspect(conn).get_columns(table)}
+
+
+def _create_index(conn, name, table, columns, unique=False):
+    conn.execute(db.text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+@migration(1, 'cadet.name_normalized for indexed roster lookups')
+def _migration_1(conn):
+    if not _has_column(conn, 'cadet', 'name_normalized'):
+        conn.execute(db.text('ALTER TABLE cadet ADD COLUMN name_normalized VARCHAR(100)'))
+    _create_index(conn, 'ix_cadet_name_normalized', 'cadet', ['name_normalized'])
+    _normalize_cadet_names(conn, db.text('SELECT id, name, name_normalized FROM cadet WHERE name_normalized IS NULL'))
+
+
+# normalize_name() in Python rather than lower(trim()) in SQL, which differ
+# on non-ASCII letters and on tabs/newlines
+def _normalize_cadet_names(conn, select):
+    rows = [{'id': id_, 'norm': normalize_name(name)} for id_, name, norm in conn.execute(select)
+            if normalize_name(name) != norm]
+    if rows:
+        conn.execute(db.text('UPDATE cadet SET name_normalized = :norm WHERE id = :id'), rows)
+
+
+@migration(2, 'indexes for excusal/override/event lookups, unique override per cadet+event')
+def _migration_2(conn):
+    _create_index(conn, 'ix_excusal_status', 'excusal', ['status'])
+    _create_index(conn, 'ix_excusal_event_name_date', 'excusal', ['event', 'name', 'date'])
+    _create_index(conn, 'ix_event_date', 'event', ['date'])
+    # keep only the newest override for each cadet/event before enforcing uniqueness
+    conn.execute(db.text(
+        'DELETE FROM attendance_override WHERE id NOT IN '
+        '(SELECT max_id FROM (SELECT MAX(id) AS max_id FROM attendance_override GROUP BY cadet_id, event_id) keep)'))
+    _create_index(conn, 'uq_attendance_override_cadet_event', 'attendance_override', ['cadet_id', 'event_id'], unique=True)
+
+
+@migration(3, 'excusal.cadet_id/event_id foreign keys, backfilled from name/event strings')
+def _migration_3(conn):
+    if not _has_column(conn, 'excusal', 'cadet_id'):
+        conn.execute(db.text('ALTER TABLE excusal ADD COLUMN cadet_id INTEGER REFERENCES cadet (id)'))
+    if not _has_column(conn, 'excusal', 'event_id'):
+        conn.execute(db.text('ALTER TABLE excusal ADD COLUMN event_id INTEGER REFERENCES event (id)'))
+    _resolve_excusal_cadets(conn)
+    # event names repeat (e.g. weekly llab): take the first such event on or
+    # after the excusal date, otherwise the latest one
+    conn.execute(db.text(
+        'UPDATE excusal SET event_id = COALESCE('
+        '(SELECT e.id FROM event e WHERE e.name = excusal.event AND e.date >= excusal.date '
+        ' ORDER BY e.date, e.id LIMIT 1), '
+        '(SELECT e.id FROM event e WHERE e.name = excusal.event ORDER BY e.date DESC, e.id DESC LIMIT 1)) '
+        'WHERE event_id IS NULL'))
+    _create_index(conn, 'ix_excusal_cadet_id', 'excusal', ['cadet_id'])
+    _create_index(conn, 'ix_excusal_event_cadet_date', 'excusal', ['event_id', 'cadet_id', 'date'])
+    conn.execute(db.text('DROP INDEX IF EXISTS ix_excusal_event_name_date'))
+
+
+# Link unlinked excusals to the lowest cadet id with the same
+# normalize_name(). Names are normalized here from cadet.name rather than
+# read from name_normalized, which migration 8 only corrects later on
+# databases that ran the old migration 1. Returns the events touched.
+def _resolve_excusal_cadets(conn):
+    cadet_ids = {}
+    for id_, name in conn.execute(db.text('SELECT id, name FROM cadet ORDER BY id DESC')):
+        cadet_ids[normalize_name(name)] = id_
+    rows, events = [], set()
+    for id_, name, event_id in conn.execute(db.text('SELECT id, name, event_id FROM excusal WHERE cadet_id IS NULL')):
+        cadet_id = cadet_ids.get(normalize_name(name))
+        if cadet_id:
+            rows.append({'id': id_, 'cadet_id': cadet_id})
+            events.add(event_id)
+    if rows:
+        conn.execute(db.text('UPDATE excusal SET cadet_id = :cadet_id WHERE id = :id'), rows)
+    return events - {None}
+
+
+@migration(4, 'excusal(status, id) index for keyset pagination of pending excusals')
+def _migration_4(conn):
+    _create_index(conn, 'ix_excusal_status_id', 'excusal', ['status', 'id'])
+    conn.execute(db.text('DROP INDEX IF EXISTS ix_excusal_status'))
+
+
+@migration(5, 'excusal.submission_token for idempotent queued submissions')
+def _migration_5(conn):
+    if not _has_column(conn, 'excusal', 'submission_token'):
+        conn.execute(db.text('ALTER TABLE excusal ADD COLUMN submission_token VARCHAR(36)'))
+    _create_index(conn, 'uq_excusal_submission_token', 'excusal', ['submission_token'], unique=True)
+
+
+@migration(6, 'event.archived_at for archiving past events')
+def _migration_6(conn):
+    if not _has_column(conn, 'event', 'archived_at'):
+        conn.execute(db.text('ALTER TABLE event ADD COLUMN archived_at VARCHAR(40)'))
+
+
+@migration(7, 'attendance_override unique index as (event_id, cadet_id) for per-event lookups')
+def _migration_7(conn):
+    _create_index(conn, 'uq_attendance_override_event_cadet', 'attendance_override', ['event_id', 'cadet_id'], unique=True)
+    conn.execute(db.text('DROP INDEX IF EXISTS uq_attendance_override_cadet_event'))
+
+
+@migration(8, 'recompute cadet.name_normalized with normalize_name()')
+def _migration_8(conn):
+    _normalize_cadet_names(conn, db.text('SELECT id, name, name_normalized FROM cadet'))
+
+
+@migration(9, 're-resolve excusal.cadet_id with normalize_name()')
+def _migration_9(conn):
+    # excusals migration 3 could not link when it matched in SQL; their
+    # events' headcounts are dropped here and recounted by migrate_db()
+    events = sorted(_resolve_excusal_cadets(conn))
+    if events:
+        conn.execute(db.delete(EventAttendanceSummary).where(EventAttendanceSummary.event_id.in_(events)))
+
+
+def schema_version():
+    return db.session.query(db.func.max(SchemaVersion.version)).scalar() or 0
+
+
+def migrate_db():
+    """Bring the database schema up to date; returns the versions applied."""
+    db.create_all()
+    applied = []
+    with db.engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            # serialize concurrent upgrades from several workers
+            conn.execute(db.text('SELECT pg_advisory_xact_lock(74201)'))
+        current = conn.execute(db.select(db.func.max(SchemaVersion.version))).scalar() or 0
+        for version, description, fn in MIGRATIONS:
+            if version <= current:
+                continue
+            fn(conn)
+            conn.execute(db.insert(SchemaVersion).values(
+                version=version, description=description, applied_at=datetime.utcnow().isoformat()))
+            applied.append(version)
+    for version in applied:
+        app.logger.info(f'Applied schema migration {version}')
+    # events created before the summary table (or bulk-loaded) get their
+    # headcounts here rather than on a page view
+    filled = fill_missing_event_summaries()
+    if filled:
+        app.logger.info(f'Filled in attendance summaries for {filled} events')
+    return applied
+
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Create missing tables and apply pending schema migrations."""
+    applied = migrate_db()
+    click.echo(f"applied migrations: {applied or 'none'}; schema version {schema_version()}")
+
+
+@app.cli.command('db-version')
+def db_version_command():
+    """Show the current schema version and any pending migrations."""
+    current = schema_version()
+    pending = [v for v, _, _ in MIGRATIONS if v > current]
+    click.echo(f"schema version {current}; pending: {pending or 'none'}")
+
+
 # Initialize database tables when the app is imported by a WSGI server.
 # This creates only the tables (no seeding). We only run initialization if
 # a DATABASE_URL is configured to avoid unintentionally creating local files.
@@ -88,19 +1770,52 @@ def init_db():
 
     try:
         with app.app_context():
-            db.create_all()
-            app.logger.info('Database tables ensured (create_all).')
+            migrate_db()
+            app.logger.info('Database schema ensured (create_all + migrations).')
     except Exception:
         app.logger.exception('Database initialization failed')
 
 
 # Run DB initialization at import time so WSGI servers (gunicorn) have tables
-# present. If DATABASE_URL is not set, this is a no-op.
-try:
-    init_db()
-except Exception:
-    # init_db logs errors; don't re-raise during import
-    pass
+# present. If DATABASE_URL is not set, this is a no-op. Deployments that
+# migrate once up front (gunicorn.conf.py) set DB_INIT_ON_IMPORT=0 so
+# workers start without touching the schema.
+if app.config['DB_INIT_ON_IMPORT']:
+    try:
+        init_db()
+    except Exception:
+        # init_db logs errors; don't re-raise during import
+        pass
+
+
+DEFAULT_EVENTS = [
+    ('llab', '2025-09-17'),
+    ('class', '2025-09-17'),
+    ('2025 FTX', '2025-10-01'),
+]
+
+
+# Seed an empty database: cadets from roster.csv (bulk sync_roster) and the
+# default events (one insert). Tables that already have rows are left alone.
+def seed_db():
+    seeded = {'cadets': 0, 'events': 0}
+    if not db.session.query(Cadet.id).first():
+        roster_path = roster_csv_path()
+        if os.path.exists(roster_path):
+            seeded['cadets'] = sync_roster(roster_path)['added']
+    if not db.session.query(Event.id).first():
+        db.session.execute(db.insert(Event), [{'name': n, 'date': d} for n, d in DEFAULT_EVENTS])
+        db.session.commit()
+        fill_missing_event_summaries()
+        seeded['events'] = len(DEFAULT_EVENTS)
+    return seeded
+
+
+@app.cli.command('seed')
+def seed_command():
+    """Fill an empty database with roster.csv and the default events."""
+    seeded = seed_db()
+    click.echo(f"seeded {seeded['cadets']} cadets, {seeded['events']} events")
 
 # Staff login
 @app.route("/staff-login", methods=["GET", "POST"])
@@ -136,57 +1851,426 @@ def clear_session():
 # (Roster management route defined later)
 
 # Excusal form
+# SQLite fails one side of a write-write deadlock (two transactions that
+# have both read, then both try to write) with "database is locked" at once
+# instead of waiting out the busy timeout; the loser just runs again.
+SQLITE_LOCK_RETRIES = 5
+
+
+def _is_sqlite_lock_error(exc):
+    return isinstance(exc, OperationalError) and 'database is locked' in str(exc.orig)
+
+
+# Write a batch of validated submissions (excusal_payload dicts): one bulk
+# insert, one bulk cadet status update, one headcount adjustment. Tokens
+# already in the table are skipped, so replaying a batch is harmless.
+def commit_excusals(payloads):
+    for attempt in range(SQLITE_LOCK_RETRIES):
+        try:
+            return _commit_excusals(payloads)
+        except OperationalError as e:
+            if not _is_sqlite_lock_error(e) or attempt == SQLITE_LOCK_RETRIES - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def _commit_excusals(payloads):
+    tokens = [p['submission_token'] for p in payloads]
+    seen = set()
+    for chunk in _chunks(tokens):
+        seen.update(t for (t,) in db.session.query(Excusal.submission_token).filter(Excusal.submission_token.in_(chunk)))
+    payloads = [p for p in payloads if p['submission_token'] not in seen]
+    if not payloads:
+        return 0
+    cadet_ids = sorted({p['cadet_id'] for p in payloads})
+    events = sorted({p['event_id'] for p in payloads if p['event_id']})
+    try:
+        with attendance_summary_delta({(p['cadet_id'], p['event_id']) for p in payloads}):
+            db.session.execute(db.insert(Excusal).execution_options(attendance_events=events), payloads)
+            db.session.execute(db.update(Cadet).execution_options(roster_unchanged=True),
+                               [{'id': c, 'status': 'pending'} for c in cadet_ids])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(payloads)
+
+
+# resolved_event: (event or None, label) when the caller has already looked
+# the event up, otherwise it comes from the form
+def excusal_payload(form, cadet, name, resolved_event=None):
+    ev, ev_label = resolved_event or event_from_form(form)
+    return {
+        'submission_token': uuid.uuid4().hex,
+        'cadet_id': cadet.id,
+        'event_id': ev.id if ev else None,
+        'date': form.get("date", date.today().isoformat()),
+        'cpt': form.get("cpt", ""),
+        'company': form.get("company", ""),
+        'event': ev_label,  # Use excused_from as the event
+        'excused_from': ev_label,
+        'reason': form.get("reason", ""),
+        'makeup_plan': form.get("makeup_plan", ""),
+        'poc': form.get("poc", ""),
+        'phone': "",  # No longer collected
+        'email': "",  # No longer collected
+        'name': name,
+        'position': form.get("position", ""),
+        'status': "pending",
+    }
+
+
+# Excusal ingestion queue for submission spikes. With EXCUSAL_QUEUE_PATH set,
+# /excusal validates the form, appends it to a local SQLite (WAL) queue and
+# answers at once; EXCUSAL_QUEUE_WORKERS threads per process claim batches
+# of up to EXCUSAL_QUEUE_BATCH submissions and write them with
+# commit_excusals(). A claim is a row update inside BEGIN IMMEDIATE, so
+# several gunicorn workers can share one queue file; claims not completed
+# within CLAIM_TIMEOUT seconds (a worker died mid-batch) are taken over.
+# When a batch can't be committed its items are retried one by one, so one
+# bad submission doesn't hold up the rest; an item that fails on its own is
+# retried later with exponential backoff, and after MAX_ATTEMPTS it moves
+# to the dead_submission table with the error (and is logged).
+class ExcusalQueue:
+    CLAIM_TIMEOUT = 60
+    MAX_ATTEMPTS = 8
+
+    def __init__(self, path_fn):
+        self._path_fn = path_fn
+        self._ready = None
+        self._pid = None
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._mutex = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self._path_fn())
+
+    def _connect(self):
+        path = self._path_fn()
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        if self._ready != path:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS submission (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'token TEXT NOT NULL UNIQUE, payload TEXT NOT NULL, queued_at REAL NOT NULL, '
+                         'claimed_by TEXT, claimed_at REAL, attempts INTEGER NOT NULL DEFAULT 0, retry_at REAL)')
+            # queue files created before retries existed
+            columns = {r[1] for r in conn.execute('PRAGMA table_info(submission)')}
+            if 'attempts' not in columns:
+                conn.execute('ALTER TABLE submission ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+                conn.execute('ALTER TABLE submission ADD COLUMN retry_at REAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS dead_submission (id INTEGER PRIMARY KEY, '
+                         'token TEXT NOT NULL UNIQUE, payload TEXT NOT NULL, queued_at REAL NOT NULL, '
+                         'failed_at REAL NOT NULL, attempts INTEGER NOT NULL, error TEXT)')
+            self._ready = path
+        return conn
+
+    def enqueue(self, payload):
+        conn = self._connect()
+        try:
+            conn.execute('INSERT INTO submission (token, payload, queued_at) VALUES (?, ?, ?)',
+                         (payload['submission_token'], json.dumps(payload), time.time()))
+        finally:
+            conn.close()
+        self.start()
+        self._wake.set()
+
+    def queued(self, tokens):
+        """Return {token: payload} for the given tokens still waiting in the queue."""
+        if not tokens or not self.enabled:
+            return {}
+        conn = self._connect()
+        try:
+            rows = conn.execute(f'SELECT token, payload FROM submission WHERE token IN ({",".join("?" * len(tokens))})',
+                                list(tokens)).fetchall()
+        finally:
+            conn.close()
+        return {t: json.loads(p) for t, p in rows}
+
+    def failed(self, tokens):
+        """Return {token: payload} for the given tokens moved to dead_submission."""
+        if not tokens or not self.enabled:
+            return {}
+        conn = self._connect()
+        try:
+            rows = conn.execute(f'SELECT token, payload FROM dead_submission WHERE token IN ({",".join("?" * len(tokens))})',
+                                list(tokens)).fetchall()
+        finally:
+            conn.close()
+        return {t: json.loads(p) for t, p in rows}
+
+    def depth(self):
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM submission').fetchone()[0]
+        finally:
+            conn.close()
+
+    def dead_letters(self):
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM dead_submission').fetchone()[0]
+        finally:
+            conn.close()
+
+    def _claim(self, owner, limit):
+        conn = self._connect()
+        try:
+            now = time.time()
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute(
+                'UPDATE submission SET claimed_by = ?, claimed_at = ? WHERE id IN '
+                '(SELECT id FROM submission WHERE (claimed_by IS NULL AND (retry_at IS NULL OR retry_at <= ?)) '
+                'OR claimed_at < ? ORDER BY id LIMIT ?) '
+                'RETURNING id, payload', (owner, now, now, now - self.CLAIM_TIMEOUT, limit)).fetchall()
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        return rows
+
+    def _finish(self, owner, ids, done):
+        conn = self._connect()
+        try:
+            marks = ','.join('?' * len(ids))
+            if done:
+                conn.execute(f'DELETE FROM submission WHERE claimed_by = ? AND id IN ({marks})', [owner] + ids)
+            else:
+                conn.execute(f'UPDATE submission SET claimed_by = NULL, claimed_at = NULL '
+                             f'WHERE claimed_by = ? AND id IN ({marks})', [owner] + ids)
+        finally:
+            conn.close()
+
+    def _fail(self, owner, id_, error):
+        """Release a claimed item for a later retry, or dead-letter it once it
+        has failed MAX_ATTEMPTS times; returns True if it was dead-lettered."""
+        conn = self._connect()
+        try:
+            now = time.time()
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('UPDATE submission SET claimed_by = NULL, claimed_at = NULL, attempts = attempts + 1, '
+                         'retry_at = ? + (1 << MIN(attempts, 10)) WHERE claimed_by = ? AND id = ?', (now, owner, id_))
+            moved = conn.execute(
+                'INSERT OR REPLACE INTO dead_submission (id, token, payload, queued_at, failed_at, attempts, error) '
+                'SELECT id, token, payload, queued_at, ?, attempts, ? FROM submission WHERE id = ? AND attempts >= ?',
+                (now, repr(error), id_, self.MAX_ATTEMPTS)).rowcount
+            if moved:
+                conn.execute('DELETE FROM submission WHERE id = ?', (id_,))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        return bool(moved)
+
+    def process_batch(self, owner=None):
+        """Claim and commit one batch; returns the number of queued items handled."""
+        owner = owner or f'{os.getpid()}:{threading.get_ident()}'
+        rows = self._claim(owner, app.config['EXCUSAL_QUEUE_BATCH'])
+        if not rows:
+            return 0
+        ids = [r[0] for r in rows]
+        try:
+            with app.app_context():
+                commit_excusals([json.loads(r[1]) for r in rows])
+        except Exception:
+            app.logger.warning('Excusal queue batch of %d failed; retrying items one by one', len(rows), exc_info=True)
+        else:
+            self._finish(owner, ids, done=True)
+            return len(rows)
+
+        for id_, payload in rows:
+            try:
+                with app.app_context():
+                    commit_excusals([json.loads(payload)])
+            except Exception as e:
+                if self._fail(owner, id_, e):
+                    app.logger.error('Excusal submission %d failed %d times; moved to dead_submission: %r',
+                                     id_, self.MAX_ATTEMPTS, e)
+            else:
+                self._finish(owner, [id_], done=True)
+        return len(rows)
+
+    def drain(self):
+        total = 0
+        while True:
+            n = self.process_batch()
+            if not n:
+                return total
+            total += n
+
+    def start(self):
+        # threads don't survive fork(), so each worker process starts its own
+        with self._mutex:
+            if self._pid == os.getpid() or not self.enabled:
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [threading.Thread(target=self._run, name=f'excusal-queue-{i}', daemon=True)
+                             for i in range(app.config['EXCUSAL_QUEUE_WORKERS'])]
+            for t in self._threads:
+                t.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        with self._mutex:
+            self._pid = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.process_batch():
+                    continue
+            except Exception:
+                app.logger.exception('Excusal queue batch failed; will retry')
+                self._stop.wait(1)
+            self._wake.wait(app.config['EXCUSAL_QUEUE_POLL'])
+            self._wake.clear()
+
+
+excusal_queue = ExcusalQueue(lambda: app.config['EXCUSAL_QUEUE_PATH'])
+atexit.register(excusal_queue.stop)
+
+
+# pick up submissions left in the queue by a previous run
+@app.before_request
+def _start_excusal_queue():
+    if excusal_queue.enabled:
+        excusal_queue.start()
+
+
+@app.cli.command('drain-excusal-queue')
+def drain_excusal_queue_command():
+    """Commit every queued excusal submission now."""
+    click.echo(f'handled {excusal_queue.drain()} queued excusals; '
+               f'{excusal_queue.depth()} waiting to retry, {excusal_queue.dead_letters()} dead-lettered')
+
+
+# The submitter's own recent submissions, queued or committed, for
+# pending_excusals. Tokens are kept in the session.
+RECENT_SUBMISSIONS = 10
+
+
+def recent_submissions():
+    tokens = session.get('submissions') or []
+    if not tokens:
+        return []
+    queued = excusal_queue.queued(tokens)
+    failed = excusal_queue.failed(tokens)
+    stored = {e.submission_token: e for e in Excusal.query.filter(Excusal.submission_token.in_(tokens))}
+    out = []
+    for t in reversed(tokens):
+        if t in stored:
+            e = stored[t]
+            out.append({'event': e.event, 'date': e.date, 'status': e.status})
+        elif t in queued:
+            out.append({'event': queued[t]['event'], 'date': queued[t]['date'], 'status': 'queued'})
+        elif t in failed:
+            out.append({'event': failed[t]['event'], 'date': failed[t]['date'], 'status': 'failed'})
+    return out
+
+
+def recent_submissions_key():
+    tokens = session.get('submissions') or []
+    if not tokens:
+        return ''
+    return ','.join(tokens) + '|' + ','.join(sorted(excusal_queue.queued(tokens))) + \
+        '|' + ','.join(sorted(excusal_queue.failed(tokens)))
+
+
 @app.route("/excusal", methods=["GET", "POST"])
 def excusal():
     if request.method == "POST":
         name = request.form.get("name", "").strip()
         # attempt to match name to roster case-insensitively
-        cadet = None
-        if name:
-            norm = normalize_name(name)
-            for c in Cadet.query.all():
-                if normalize_name(c.name) == norm:
-                    cadet = c
-                    break
+        cadet = find_cadet_by_name(name)
 
         if not cadet:
-            flash("Name not found on roster (check capitalization/spelling). If this is correct, please contact staff to add the cadet.")
+            matches = roster_index.suggest(name, limit=3, prefix=False)
+            if matches:
+                flash("Name not found on roster. Did you mean: " + ", ".join(m.name for m in matches) + "?")
+            else:
+                flash("Name not found on roster (check capitalization/spelling). If this is correct, please contact staff to add the cadet.")
             return redirect(url_for("excusal"))
 
-        new_excusal = Excusal(
-            date=request.form.get("date", date.today().isoformat()),
-            cpt=request.form.get("cpt", ""),
-            company=request.form.get("company", ""),
-            event=request.form.get("excused_from", ""),  # Use excused_from as the event
-            excused_from=request.form.get("excused_from", ""),
-            reason=request.form.get("reason", ""),
-            makeup_plan=request.form.get("makeup_plan", ""),
-            poc=request.form.get("poc", ""),
-            phone="",  # No longer collected
-            email="",  # No longer collected
-            name=name,
-            position=request.form.get("position", ""),
-            status="pending"
-        )
-        db.session.add(new_excusal)
-        # mark cadet pending
-        cadet.status = "pending"
-        db.session.commit()
-        flash("Excusal submitted and is pending staff approval.")
+        payload = excusal_payload(request.form, cadet, name)
+        if excusal_queue.enabled:
+            excusal_queue.enqueue(payload)
+            flash("Excusal received. It is queued and will show as pending staff approval shortly.")
+        else:
+            commit_excusals([payload])
+            flash("Excusal submitted and is pending staff approval.")
+        session['submissions'] = (session.get('submissions') or [])[-(RECENT_SUBMISSIONS - 1):] + \
+            [payload['submission_token']]
         return redirect(url_for("pending_excusals"))
 
     # provide upcoming events for dropdowns
-    evs = Event.query.order_by(Event.date).all()
-    today_s = date.today().isoformat()
-    upcoming = [e for e in evs if e.date >= today_s]
-    return render_template("excusal.html", events=upcoming)
-
-
-# Pending excusals view (for users to see their submitted excusals)
+    return render_template("excusal.html", events=event_catalog.upcoming())
+
+
+# Name autocomplete for the excusal form
+@app.route("/roster_suggest")
+def roster_suggest():
+    q = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 8, type=int), 20)
+    if len(q) < 2:
+        return jsonify(suggestions=[])
+    return jsonify(suggestions=[m._asdict() for m in roster_index.suggest(q, limit=limit)])
+
+
+# Pending excusal queue, paged by keyset on id (oldest submission first)
+# so each page is one index range scan however long the backlog is.
+PENDING_PAGE_SIZE = 50
+
+
+def pending_filters(args):
+    return {
+        'event_id': args.get('event_id', type=int),
+        'company': (args.get('company') or '').strip(),
+        'start': args.get('start') or '',
+        'end': args.get('end') or '',
+    }
+
+
+def pending_excusals_page(after=None, event_id=None, company=None, start=None, end=None, limit=PENDING_PAGE_SIZE):
+    """Return (excusals, next_cursor); next_cursor is None on the last page."""
+    q = Excusal.query.filter(Excusal.status == 'pending')
+    if event_id:
+        q = q.filter(Excusal.event_id == event_id)
+    if company:
+        q = q.filter(db.func.lower(Excusal.company) == company.lower())
+    if start:
+        q = q.filter(Excusal.date >= start)
+    if end:
+        q = q.filter(Excusal.date <= end)
+    if after:
+        q = q.filter(Excusal.id > after)
+    rows = q.order_by(Excusal.id).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+# pending counts per event from one GROUP BY, for the dashboard summary
+def pending_counts_by_event():
+    return (db.session.query(Excusal.event_id, Event.name, Event.date, db.func.count(Excusal.id))
+            .outerjoin(Event, Event.id == Excusal.event_id)
+            .filter(Excusal.status == 'pending')
+            .group_by(Excusal.event_id, Event.name, Event.date)
+            .order_by(Event.date)
+            .all())
+
+
+# Pending excusals view (for users to see their submitted excusals). It
+# only shows this browser's own submissions; staff page through the whole
+# pending queue on the dashboard.
 @app.route("/pending_excusals")
+@read_replica
+@conditional_view('excusal', vary=recent_submissions_key)
 def pending_excusals():
-    excusals = Excusal.query.filter_by(status="pending").all()
-    return render_template("pending_excusals.html", excusals=excusals)
+    return render_template("pending_excusals.html", submissions=recent_submissions())
 
 
 # Edit excusal - redirect back to excusal form with pre-filled data
@@ -196,28 +2280,202 @@ def edit_excusal(excusal_id):
     
     if request.method == "GET":
         # Pre-fill the form with existing data
-        evs = Event.query.order_by(Event.date).all()
-        today_s = date.today().isoformat()
-        upcoming = [e for e in evs if e.date >= today_s]
-        return render_template("excusal.html", events=upcoming, excusal=excusal)
+        return render_template("excusal.html", events=event_catalog.upcoming(), excusal=excusal)
     
     # Handle form submission for editing
     if request.method == "POST":
         # Update the existing excusal
-        excusal.date = request.form.get("date", excusal.date)
-        excusal.cpt = request.form.get("cpt", excusal.cpt)
-        excusal.company = request.form.get("company", excusal.company)
-        excusal.excused_from = request.form.get("excused_from", excusal.excused_from)
-        excusal.reason = request.form.get("reason", excusal.reason)
-        excusal.makeup_plan = request.form.get("makeup_plan", excusal.makeup_plan)
-        excusal.poc = request.form.get("poc", excusal.poc)
-        excusal.position = request.form.get("position", excusal.position)
-        
+        ev, ev_label = event_from_form(request.form)
+        affected = [(excusal.cadet_id, excusal.event_id), (excusal.cadet_id, ev.id if ev else None)]
+        with attendance_summary_delta(affected):
+            excusal.date = request.form.get("date", excusal.date)
+            excusal.cpt = request.form.get("cpt", excusal.cpt)
+            excusal.company = request.form.get("company", excusal.company)
+            if request.form.get("event_id") or request.form.get("excused_from"):
+                excusal.event_id = ev.id if ev else None
+                excusal.event = excusal.excused_from = ev_label
+            excusal.reason = request.form.get("reason", excusal.reason)
+            excusal.makeup_plan = request.form.get("makeup_plan", excusal.makeup_plan)
+            excusal.poc = request.form.get("poc", excusal.poc)
+            excusal.position = request.form.get("position", excusal.position)
+
         db.session.commit()
         flash("Excusal updated successfully.")
         return redirect(url_for("pending_excusals"))
 
 
+# Bulk moderation: approve or deny every pending excusal matching a
+# selection (event, excusal date range, company and/or explicit ids) with
+# two UPDATE statements in one transaction -- the cadets' statuses first
+# (selected through a subquery), then the excusals themselves.
+def moderate_excusals(action, event_id=None, start=None, end=None, company=None, ids=None):
+    if action not in ('approve', 'deny'):
+        raise ValueError(f'unknown moderation action: {action!r}')
+    conds = [Excusal.status == 'pending']
+    if event_id:
+        conds.append(Excusal.event_id == int(event_id))
+    if start:
+        conds.append(Excusal.date >= start)
+    if end:
+        conds.append(Excusal.date <= end)
+    if company:
+        conds.append(db.func.lower(Excusal.company) == company.strip().lower())
+    if ids is not None:
+        conds.append(Excusal.id.in_([int(i) for i in ids]))
+    if len(conds) == 1:
+        # never approve/deny the whole backlog by accident
+        raise ValueError('a selection (event, date range, company or ids) is required')
+
+    approve = action == 'approve'
+    try:
+        touched_events = [e for (e,) in db.session.execute(
+            db.select(Excusal.event_id).where(Excusal.event_id.isnot(None), *conds).distinct())]
+        selected_cadets = db.select(Excusal.cadet_id).where(Excusal.cadet_id.isnot(None), *conds)
+        cadets = db.session.execute(
+            db.update(Cadet).where(Cadet.id.in_(selected_cadets))
+            .values(status='excused' if approve else 'present')
+            .execution_options(synchronize_session=False, roster_unchanged=True)).rowcount
+        excusals = db.session.execute(
+            db.update(Excusal).where(*conds)
+            .values(status='approved' if approve else 'denied')
+            .execution_options(synchronize_session=False, attendance_events=touched_events)).rowcount
+        recount_event_summaries(touched_events)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {'action': action, 'excusals': excusals, 'cadets': cadets}
+
+
+# JSON/form API around moderate_excusals()
+@app.route('/moderate_excusals', methods=['POST'])
+@staff_required
+def moderate_excusals_api():
+    data = request.get_json(silent=True)
+    if data is None:
+        data = request.form
+        ids = request.form.getlist('ids') or None
+    elif isinstance(data, dict):
+        ids = data.get('ids')
+        # a mistyped ids must not quietly widen the selection to the other filters
+        if ids is not None and not isinstance(ids, list):
+            return jsonify(error='ids must be a list'), 400
+    else:
+        return jsonify(error='expected a JSON object or form fields'), 400
+    for field in ('action', 'start', 'end', 'company'):
+        if data.get(field) is not None and not isinstance(data.get(field), str):
+            return jsonify(error=f'{field} must be a string'), 400
+    try:
+        result = moderate_excusals(data.get('action'), event_id=data.get('event_id'), start=data.get('start'),
+                                   end=data.get('end'), company=data.get('company'), ids=ids)
+    except (ValueError, TypeError) as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(result)
+
+
+# Batch excusal submission for unit leadership, e.g. a whole squad excused
+# from one event:
+#   POST /excusals {"event_id": 3, "reason": "...", "date": "...",
+#                   "excusals": [{"name": "..."}, {"name": "...", "reason": "..."}]}
+# Top-level fields are defaults for every item. Names are resolved in one
+# roster query and every known cadet's excusal is written with
+# commit_excusals() in one transaction (not through the ingestion queue);
+# the answer lists each item's outcome in request order.
+MAX_EXCUSAL_BATCH = 1000
+EXCUSAL_TEXT_FIELDS = ('name', 'date', 'cpt', 'company', 'excused_from', 'reason', 'makeup_plan', 'poc', 'position')
+
+
+def clean_excusal_fields(item):
+    """item with its text fields as stripped strings (numbers are
+    converted), or raise ValueError naming the first bad field."""
+    cleaned = dict(item)
+    for field in EXCUSAL_TEXT_FIELDS:
+        value = item.get(field)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f'{field} must be a string')
+        value = str(value).strip()
+        limit = Excusal.__table__.c[field].type.length
+        if limit and len(value) > limit:
+            raise ValueError(f'{field} is longer than {limit} characters')
+        cleaned[field] = value
+    return cleaned
+
+
+def submit_excusal_batch(items, defaults=None):
+    """Write the excusals for items (dicts of excusal form fields) and return
+    one result dict per item."""
+    defaults = defaults or {}
+    cleaned = []
+    for item in items:
+        try:
+            cleaned.append(clean_excusal_fields({**defaults, **item}))
+        except ValueError as e:
+            cleaned.append(e)
+    cadets = find_cadets_by_names(item.get('name') or '' for item in cleaned if isinstance(item, dict))
+    events = {e.id: e for e in event_catalog.all()}
+    results, payloads = [], []
+    for i, item in enumerate(cleaned):
+        result = {'index': i}
+        results.append(result)
+        if isinstance(item, ValueError):
+            result.update(status='invalid', error=str(item))
+            continue
+        name = item.get('name') or ''
+        result['name'] = name
+        if not name:
+            result.update(status='invalid', error='missing field: name')
+            continue
+        cadet = cadets.get(normalize_name(name))
+        if cadet is None:
+            result.update(status='unknown_name',
+                          suggestions=[m.name for m in roster_index.suggest(name, limit=3, prefix=False)])
+            continue
+        event_id = item.get('event_id')
+        if event_id not in (None, ''):
+            try:
+                ev = events.get(int(event_id))
+            except (TypeError, ValueError):
+                ev = None
+            if ev is None:
+                result.update(status='invalid', error=f'unknown event: {event_id}')
+                continue
+            resolved_event = (ev, ev.name)
+        else:
+            resolved_event = (None, item.get('excused_from') or '')
+        payload = excusal_payload(item, cadet, name, resolved_event)
+        payloads.append(payload)
+        result.update(status='created', cadet_id=cadet.id, event_id=payload['event_id'],
+                      submission_token=payload['submission_token'])
+    if payloads:
+        commit_excusals(payloads)
+    return results
+
+
+@app.route('/excusals', methods=['POST'])
+@staff_required
+def excusals_api():
+    data = request.get_json(silent=True)
+    items = data.get('excusals') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify(error='excusals must be a list of objects'), 400
+    if len(items) > MAX_EXCUSAL_BATCH:
+        return jsonify(error=f'at most {MAX_EXCUSAL_BATCH} excusals per request'), 400
+    # a bad default would fail every item: reject it once instead
+    try:
+        defaults = clean_excusal_fields({k: v for k, v in data.items() if k != 'excusals'})
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    event_id = defaults.get('event_id')
+    if event_id not in (None, '') and not (str(event_id).isdigit() and event_catalog.get(int(event_id))):
+        return jsonify(error=f'unknown event: {event_id}'), 400
+    results = submit_excusal_batch(items, defaults)
+    counts = Counter(r['status'] for r in results)
+    return jsonify(created=counts['created'], unknown_name=counts['unknown_name'], invalid=counts['invalid'],
+                   results=results)
+
+
 @app.route('/staff-dashboard', methods=['GET', 'POST'])
 @staff_required
 def staff_dashboard():
@@ -229,36 +2487,39 @@ def staff_dashboard():
             if action in ('approve', 'deny') and excusal_id:
                 exc = Excusal.query.get(excusal_id)
                 if exc:
-                    exc.status = 'approved' if action=='approve' else 'denied'
-                    # update cadet status
-                    cadet = Cadet.query.filter(Cadet.name==exc.name).first()
-                    if cadet:
-                        cadet.status = 'excused' if action=='approve' else 'present'
+                    with attendance_summary_delta([(exc.cadet_id, exc.event_id)]):
+                        exc.status = 'approved' if action=='approve' else 'denied'
+                        # update cadet status
+                        cadet = Cadet.query.get(exc.cadet_id) if exc.cadet_id else None
+                        if cadet:
+                            cadet.status = 'excused' if action=='approve' else 'present'
                     db.session.commit()
                     flash('Updated excusal.')
-            # approve all pending for an event
-            if request.form.get('bulk_action') == 'approve_event':
-                ev = request.form.get('event_id')
-                if ev:
-                    event = Event.query.get(ev)
-                    if event:
-                        pending = Excusal.query.filter_by(event=event.name, status='pending').all()
-                        for p in pending:
-                            p.status = 'approved'
-                            cadet = Cadet.query.filter(Cadet.name==p.name).first()
-                            if cadet:
-                                cadet.status = 'excused'
-                        db.session.commit()
-                        flash('Approved pending excusals for event.')
+            # approve/deny all pending for an event (or another selection)
+            bulk_action = request.form.get('bulk_action')
+            if bulk_action in ('approve_event', 'approve', 'deny'):
+                try:
+                    result = moderate_excusals('deny' if bulk_action == 'deny' else 'approve',
+                                               event_id=request.form.get('event_id'),
+                                               start=request.form.get('start'),
+                                               end=request.form.get('end'),
+                                               company=request.form.get('company'))
+                    verb = 'Approved' if result['action'] == 'approve' else 'Denied'
+                    flash(f"{verb} {result['excusals']} pending excusals.")
+                except ValueError as e:
+                    flash(f"Bulk action not applied: {e}.")
             return redirect(url_for('staff_dashboard'))
 
-        # Group pending excusals by event
-        pending = Excusal.query.filter_by(status='pending').all()
+        # Group one page of pending excusals by event
+        filters = pending_filters(request.args)
+        pending, next_cursor = pending_excusals_page(after=request.args.get('after', type=int), **filters)
         events = {}
         for p in pending:
             events.setdefault(p.event or 'Unspecified', []).append(p)
-        all_events = Event.query.order_by(Event.date).all()
-        return render_template('staff_dashboard.html', events_map=events, all_events=all_events)
+        all_events = event_catalog.all()
+        return render_template('staff_dashboard.html', events_map=events, all_events=all_events,
+                               pending_counts=pending_counts_by_event(), next_cursor=next_cursor, filters=filters,
+                               headcounts=event_headcounts([e.id for e in event_catalog.upcoming()]))
     
     except Exception as e:
         app.logger.error(f"Staff dashboard error: {e}")
@@ -266,13 +2527,84 @@ def staff_dashboard():
         return redirect(url_for("home"))
 
 
+# Set attendance overrides for many cadets of one event in one statement:
+# INSERT ... ON CONFLICT (cadet_id, event_id) DO UPDATE on Postgres and
+# SQLite, skipping rows whose override already has that status. Returns
+# {cadet_id: (old, new)} for the cadets whose resolved status changed.
+def apply_overrides(event_id, statuses):
+    if event_id in (None, ''):
+        raise ValueError('event_id is required')
+    event_id = int(event_id)
+    if event_catalog.get(event_id) is None:
+        raise ValueError(f'unknown event: {event_id}')
+    statuses = {int(c): s for c, s in statuses.items()}
+    bad = sorted({s for s in statuses.values() if s not in ATTENDANCE_STATUSES})
+    if bad:
+        raise ValueError(f'unknown status: {", ".join(map(str, bad))}')
+    known = set()
+    for chunk in _chunks(list(statuses)):
+        known.update(c for (c,) in db.session.query(Cadet.id).filter(Cadet.id.in_(chunk)))
+    if len(known) != len(statuses):
+        raise ValueError(f'unknown cadet: {", ".join(str(c) for c in sorted(set(statuses) - known))}')
+    if not statuses:
+        return {}
+
+    rows = [{'cadet_id': c, 'event_id': event_id, 'status': s} for c, s in statuses.items()]
+    try:
+        with attendance_summary_delta([(c, event_id) for c in statuses]) as changed:
+            stmt = upsert_insert(AttendanceOverride)
+            if stmt is not None:
+                stmt = stmt.values(rows)
+                db.session.execute(stmt.on_conflict_do_update(
+                    index_elements=['cadet_id', 'event_id'], set_={'status': stmt.excluded.status},
+                    where=AttendanceOverride.status != stmt.excluded.status)
+                    .execution_options(attendance_events=[event_id]))
+            else:
+                existing = dict(db.session.query(AttendanceOverride.cadet_id, AttendanceOverride.id)
+                                .filter(AttendanceOverride.event_id == event_id,
+                                        AttendanceOverride.cadet_id.in_(list(statuses))))
+                updates = [{'id': existing[r['cadet_id']], 'status': r['status']} for r in rows if r['cadet_id'] in existing]
+                inserts = [r for r in rows if r['cadet_id'] not in existing]
+                if updates:
+                    db.session.execute(db.update(AttendanceOverride).execution_options(attendance_events=[event_id]), updates)
+                if inserts:
+                    db.session.execute(db.insert(AttendanceOverride).execution_options(attendance_events=[event_id]), inserts)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {c: change for (c, _), change in changed.items()}
+
+
+# JSON API for whoiscoming: {"event_id": 3, "overrides": [{"cadet_id": 7, "status": "excused"}, ...]}
+# answers with just the rows whose status changed so the page can patch them in place.
+@app.route('/attendance_overrides', methods=['POST'])
+@staff_required
+def attendance_overrides_api():
+    data = request.get_json(silent=True) or {}
+    overrides = (data.get('overrides') or []) if isinstance(data, dict) else None
+    if not isinstance(overrides, list) or not all(isinstance(o, dict) for o in overrides):
+        return jsonify(error='expected an object with an overrides list of objects'), 400
+    try:
+        statuses = {int(o['cadet_id']): o['status'] for o in overrides}
+        changed = apply_overrides(data.get('event_id'), statuses)
+    except KeyError as e:
+        return jsonify(error=f'missing field: {e.args[0]}'), 400
+    except (ValueError, TypeError) as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(event_id=int(data['event_id']),
+                   changed=[{'cadet_id': c, 'previous': old, 'status': new} for c, (old, new) in sorted(changed.items())])
+
+
 # Who is coming page
 @app.route("/whoiscoming", methods=["GET", "POST"])
 @staff_required
+@read_replica
+@conditional_view('cadet', 'event', 'excusal', 'attendance_override')
 def whoiscoming():
     # select event for attendance view
     ev_id = request.args.get('event_id') or request.form.get('event_id')
-    events = Event.query.order_by(Event.date).all()
+    events = event_catalog.all()
 
     if request.method == "POST" and request.form.get('override_action') == 'update':
         # manual override of cadet status for specific event
@@ -280,53 +2612,28 @@ def whoiscoming():
         new_status = request.form.get("status")
         event_id = request.form.get("event_id")
         if cadet_id and event_id and new_status:
-            # upsert override
-            ov = AttendanceOverride.query.filter_by(cadet_id=cadet_id, event_id=event_id).first()
-            if ov:
-                ov.status = new_status
-            else:
-                db.session.add(AttendanceOverride(cadet_id=cadet_id, event_id=event_id, status=new_status))
-            db.session.commit()
-            flash("Override saved.")
+            try:
+                apply_overrides(event_id, {cadet_id: new_status})
+                flash("Override saved.")
+            except ValueError as e:
+                flash(f"Override not saved: {e}.")
         return redirect(url_for('whoiscoming', event_id=event_id))
 
     # determine selected event (default to upcoming first)
     sel_event = None
     if ev_id:
-        sel_event = Event.query.get(ev_id)
-    else:
-        sel_event = Event.query.order_by(Event.date).first()
-
-    cadets = Cadet.query.order_by(Cadet.name).all()
-
-    # Build status per cadet for the selected event
-    cadet_rows = []
-    for c in cadets:
-        status = 'present'  # default green
-        # check explicit override
-        if sel_event:
-            ov = AttendanceOverride.query.filter_by(cadet_id=c.id, event_id=sel_event.id).first()
-            if ov:
-                status = ov.status
-            else:
-                # check excusals for this cadet for this event
-                exc = Excusal.query.filter(Excusal.name==c.name, Excusal.event==sel_event.name).order_by(Excusal.date.desc()).first()
-                if exc:
-                    if exc.status == 'pending':
-                        status = 'pending'
-                    elif exc.status == 'approved' or exc.status == 'excused':
-                        status = 'excused'
-                    elif exc.status == 'denied':
-                        status = 'present'
-
-        cadet_rows.append({'cadet': c, 'status': status})
+        sel_event = event_catalog.get(int(ev_id)) if str(ev_id).isdigit() else None
+    elif events:
+        sel_event = events[0]
 
-    return render_template('whoiscoming.html', events=events, sel_event=sel_event, cadet_rows=cadet_rows)
+    return render_template('whoiscoming.html', events=events, sel_event=sel_event,
+                           attendance_table=render_attendance_table(sel_event))
 
 
 # Roster management (list/add/edit)
 @app.route("/roster", methods=["GET", "POST"])
 @staff_required
+@conditional_view('cadet')
 def roster():
     if request.method == "POST":
         action = request.form.get("action")
@@ -334,96 +2641,78 @@ def roster():
             name = request.form.get("name", "").strip()
             if name:
                 # avoid duplicates (case-insensitive)
-                existing = [c for c in Cadet.query.all() if normalize_name(c.name) == normalize_name(name)]
-                if existing:
+                if find_cadet_by_name(name):
                     flash("A cadet with that name already exists.")
                 else:
-                    db.session.add(Cadet(name=name, rank=''))
+                    cadet = Cadet(name=name, rank='')
+                    db.session.add(cadet)
+                    # a new cadet counts as present for every live event
+                    db.session.execute(db.update(EventAttendanceSummary).where(live_event_summaries())
+                                       .values(present=EventAttendanceSummary.present + 1))
                     db.session.commit()
-                    
-                    # Add to CSV file
-                    roster_path = os.path.join(app.root_path, 'roster.csv')
+                    roster_index.add(cadet.id, cadet.name)
+
+                    # Mirror to CSV file (written behind by roster_journal)
                     try:
-                        # Read existing CSV
-                        names = []
-                        if os.path.exists(roster_path):
-                            with open(roster_path, 'r', newline='') as f:
-                                reader = csv.DictReader(f)
-                                for row in reader:
-                                    existing_name = (row.get('names') or '').strip()
-                                    if existing_name:
-                                        names.append(existing_name)
-                        
-                        # Add new name and sort
-                        names.append(name)
-                        names.sort()
-                        
-                        # Write back to CSV
-                        with open(roster_path, 'w', newline='') as f:
-                            writer = csv.writer(f)
-                            writer.writerow(['names'])
-                            for n in names:
-                                writer.writerow([n])
-                        
+                        roster_journal.append('add', name)
                         flash("Cadet added to roster and CSV file.")
                     except Exception as e:
+                        app.logger.error(f"Roster journal error: {e}")
                         flash("Cadet added to roster, but failed to update CSV file.")
         elif action == "delete":
             cadet_id = request.form.get("cadet_id")
             cadet = Cadet.query.get(cadet_id)
             if cadet:
                 cadet_name = cadet.name
+                # take the cadet out of every live event's headcount
+                event_ids = [e for (e,) in db.session.query(EventAttendanceSummary.event_id).filter(live_event_summaries())]
+                deltas = {}
+                for (c, e), status in attendance_statuses([(cadet.id, e) for e in event_ids]).items():
+                    deltas.setdefault(e, Counter())[_summary_bucket(status)] -= 1
+                apply_summary_delta(deltas)
+                # keep the excusal history (by name) but drop the cadet link and overrides
+                Excusal.query.filter_by(cadet_id=cadet.id).update({'cadet_id': None})
+                AttendanceOverride.query.filter_by(cadet_id=cadet.id).delete()
+                cadet_id = cadet.id
                 db.session.delete(cadet)
                 db.session.commit()
-                
-                # Remove from CSV file
-                roster_path = os.path.join(app.root_path, 'roster.csv')
+                roster_index.remove(cadet_id)
+
+                # Remove from CSV file (written behind by roster_journal)
                 try:
-                    # Read existing CSV
-                    names = []
-                    if os.path.exists(roster_path):
-                        with open(roster_path, 'r', newline='') as f:
-                            reader = csv.DictReader(f)
-                            for row in reader:
-                                existing_name = (row.get('names') or '').strip()
-                                if existing_name and normalize_name(existing_name) != normalize_name(cadet_name):
-                                    names.append(existing_name)
-                    
-                    # Write back to CSV
-                    with open(roster_path, 'w', newline='') as f:
-                        writer = csv.writer(f)
-                        writer.writerow(['names'])
-                        for n in names:
-                            writer.writerow([n])
-                    
+                    roster_journal.append('delete', cadet_name)
                     flash("Cadet removed from roster and CSV file.")
                 except Exception as e:
+                    app.logger.error(f"Roster journal error: {e}")
                     flash("Cadet removed from roster, but failed to update CSV file.")
         elif action == "edit":
             cadet_id = request.form.get("cadet_id")
             name = request.form.get("name", "").strip()
             cadet = Cadet.query.get(cadet_id)
             if cadet:
+                old_name = cadet.name
                 cadet.name = name or cadet.name
                 db.session.commit()
+                if cadet.name != old_name:
+                    roster_index.rename(cadet.id, cadet.name)
+                    try:
+                        roster_journal.append('rename', old_name, cadet.name)
+                    except Exception as e:
+                        app.logger.error(f"Roster journal error: {e}")
                 flash("Cadet updated.")
         elif action == "reload_csv":
             # Reload names from roster.csv
-            roster_path = os.path.join(app.root_path, 'roster.csv')
+            roster_path = roster_csv_path()
+            # fold in any edits still waiting in the journal first
+            roster_journal.flush()
             if os.path.exists(roster_path):
-                added_count = 0
-                with open(roster_path, newline='') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        name = (row.get('names') or row.get('name') or row.get('Name') or '').strip()
-                        if name:
-                            # avoid duplicates (case-insensitive)
-                            existing = [c for c in Cadet.query.all() if normalize_name(c.name) == normalize_name(name)]
-                            if not existing:
-                                db.session.add(Cadet(name=name, rank=''))
-                                added_count += 1
-                db.session.commit()
-                flash(f"Added {added_count} new cadets from roster.csv")
+                summary = sync_roster(roster_path,
+                                      delete_missing=bool(request.form.get("delete_missing")),
+                                      rename=bool(request.form.get("rename")),
+                                      dry_run=bool(request.form.get("dry_run")))
+                prefix = "Dry run: would have" if summary['dry_run'] else "Reloaded roster.csv:"
+                flash(f"{prefix} added {summary['added']}, renamed {summary['renamed']}, "
+                      f"removed {summary['removed']}, unchanged {summary['unchanged']} cadets")
             else:
                 flash("roster.csv file not found")
 
@@ -433,51 +2722,89 @@ def roster():
     return render_template("roster.html", cadets=cadets)
 
 
+# Streaming CSV exports.
+# Rows are pulled from the database in batches (yield_per, which uses a
+# server-side cursor on Postgres), written through a small CSV buffer and
+# sent as chunks of a streamed response, gzip-encoded when the client
+# accepts it. Memory stays flat no matter how many rows are exported.
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _csv_chunks(header, rows):
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= EXPORT_CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _gzip_chunks(chunks):
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = gz.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield gz.flush()
+
+
+def stream_csv(header, rows, filename):
+    chunks = _csv_chunks(header, rows)
+    headers = {'Content-Disposition': f'attachment; filename={filename}', 'Vary': 'Accept-Encoding'}
+    if app.config['EXPORT_GZIP'] and 'gzip' in request.accept_encodings:
+        chunks = _gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(chunks), mimetype='text/csv', headers=headers)
+
+
 # Export roster as CSV
 @app.route("/export_roster")
 @staff_required
+@read_replica
+@conditional_view('cadet')
 def export_roster():
-    cadets = Cadet.query.order_by(Cadet.name).all()
-    si = []
-    # Use csv.writer on list to build rows
-    output = []
-    header = ["name", "rank", "status"]
-    output.append(header)
-    for c in cadets:
-        output.append([c.name, c.rank or "", c.status or "present"])
-
-    # build CSV string
-    from io import StringIO
-    s = StringIO()
-    writer = csv.writer(s)
-    writer.writerows(output)
-    resp = make_response(s.getvalue())
-    resp.headers["Content-Disposition"] = "attachment; filename=roster.csv"
-    resp.headers["Content-Type"] = "text/csv"
-    return resp
+    cadets = (db.session.query(Cadet.name, Cadet.rank, Cadet.status)
+              .order_by(Cadet.name)
+              .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    rows = ([name, rank or "", status or "present"] for name, rank, status in cadets)
+    return stream_csv(["name", "rank", "status"], rows, "roster.csv")
+
+
+# exports read archived events too when called with ?include_archived=1
+def include_archived_arg():
+    return request.args.get('include_archived', '') in ('1', 'true', 'yes')
 
 
 @app.route('/export_excusals')
 @staff_required
+@read_replica
+@conditional_view('excusal', 'excusal_archive')
 def export_excusals():
-    excusals = Excusal.query.order_by(Excusal.date).all()
-    output = []
-    header = ["id","date","name","event","reason","status","email","phone"]
-    output.append(header)
-    for e in excusals:
-        output.append([e.id, e.date or "", e.name or "", e.event or "", e.reason or "", e.status or "", e.email or "", e.phone or ""])
-    from io import StringIO
-    s = StringIO()
-    writer = csv.writer(s)
-    writer.writerows(output)
-    resp = make_response(s.getvalue())
-    resp.headers["Content-Disposition"] = "attachment; filename=excusals.csv"
-    resp.headers["Content-Type"] = "text/csv"
-    return resp
+    header = ["id", "date", "name", "event", "reason", "status", "email", "phone"]
+    if include_archived_arg():
+        both = db.union_all(db.select(*[getattr(Excusal, c) for c in header]),
+                            db.select(*[getattr(ExcusalArchive, c) for c in header])).subquery()
+        excusals = (db.session.query(both)
+                    .order_by(both.c.date)
+                    .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    else:
+        excusals = (db.session.query(Excusal.id, Excusal.date, Excusal.name, Excusal.event, Excusal.reason,
+                                     Excusal.status, Excusal.email, Excusal.phone)
+                    .order_by(Excusal.date)
+                    .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    rows = ([id_] + [v or "" for v in rest] for id_, *rest in excusals)
+    return stream_csv(header, rows, "excusals.csv")
 
 
 @app.route('/export_attendance')
 @staff_required
+@read_replica
+@conditional_view('cadet', 'event', 'excusal', 'attendance_override', 'excusal_archive', 'attendance_override_archive')
 def export_attendance():
     event_id = request.args.get('event_id')
     if not event_id:
@@ -488,59 +2815,265 @@ def export_attendance():
     if not ev:
         flash('Event not found')
         return redirect(url_for('whoiscoming'))
+    archived = ev.archived_at is not None
+    if archived and not include_archived_arg():
+        flash('Event is archived; export it with include_archived=1')
+        return redirect(url_for('whoiscoming'))
 
-    cadets = Cadet.query.order_by(Cadet.name).all()
-    rows = []
-    header = ['name', 'rank', 'status', 'excusal_date', 'excusal_reason']
-    rows.append(header)
-    for c in cadets:
-        status = 'present'
-        excusal_date = ''
-        excusal_reason = ''
-        ov = AttendanceOverride.query.filter_by(cadet_id=c.id, event_id=ev.id).first()
-        if ov:
-            status = ov.status
-        else:
-            exc = Excusal.query.filter(Excusal.name==c.name, Excusal.event==ev.name).order_by(Excusal.date.desc()).first()
-            if exc:
-                if exc.status == 'pending':
-                    status = 'pending'
-                elif exc.status in ('approved','excused'):
-                    status = 'excused'
-                elif exc.status == 'denied':
-                    status = 'present'
-                excusal_date = exc.date or ''
-                excusal_reason = exc.reason or ''
-        rows.append([c.name, c.rank or '', status, excusal_date, excusal_reason])
-
-    from io import StringIO
-    s = StringIO()
-    writer = csv.writer(s)
-    writer.writerows(rows)
-    resp = make_response(s.getvalue())
+    rows = ([r['cadet'].name, r['cadet'].rank or '', r['status'], r['excusal_date'], r['excusal_reason']]
+            for r in iter_attendance(ev, yield_per=EXPORT_BATCH_SIZE, archived=archived))
     fname = f"attendance_{ev.name.replace(' ','_')}_{ev.date}.csv"
-    resp.headers['Content-Disposition'] = f'attachment; filename={fname}'
-    resp.headers['Content-Type'] = 'text/csv'
-    return resp
+    return stream_csv(['name', 'rank', 'status', 'excusal_date', 'excusal_reason'], rows, fname)
+
+
+# Attendance for many events at once (e.g. a whole semester)
+@app.route('/attendance_matrix')
+@staff_required
+@read_replica
+@conditional_view('cadet', 'event', 'excusal', 'attendance_override', 'excusal_archive', 'attendance_override_archive')
+def attendance_matrix():
+    q = Event.query
+    if not include_archived_arg():
+        q = q.filter(Event.archived_at.is_(None))
+    event_ids = request.args.getlist('event_id', type=int)
+    if event_ids:
+        q = q.filter(Event.id.in_(event_ids))
+    start = request.args.get('start')
+    end = request.args.get('end')
+    if start:
+        q = q.filter(Event.date >= start)
+    if end:
+        q = q.filter(Event.date <= end)
+    evs = q.order_by(Event.date, Event.id).all()
+    cadets, evs, grid = build_attendance_matrix(evs, archived_ids=[e.id for e in evs if e.archived_at])
+    n_events = len(evs)
+
+    if request.args.get('format', 'csv') == 'json':
+        def generate_json():
+            yield '{"statuses": %s, "events": %s, "cadets": %s, "grid": [' % (
+                json.dumps(ATTENDANCE_STATUSES),
+                json.dumps([{'id': e.id, 'name': e.name, 'date': e.date} for e in evs]),
+                json.dumps([{'id': c.id, 'name': c.name, 'rank': c.rank or ''} for c in cadets]))
+            for i in range(len(cadets)):
+                row = grid[i * n_events:(i + 1) * n_events].tolist()
+                yield ('' if i == 0 else ',') + json.dumps(row)
+            yield ']}'
+        return Response(generate_json(), mimetype='application/json')
+
+    rows = ([c.name, c.rank or ''] + [ATTENDANCE_STATUSES[code] for code in grid[i * n_events:(i + 1) * n_events]]
+            for i, c in enumerate(cadets))
+    return stream_csv(['name', 'rank'] + [f'{e.name} ({e.date})' for e in evs], rows, 'attendance_matrix.csv')
 
 
 # Events management
 @app.route("/events", methods=["GET", "POST"]) 
+# (the past/upcoming split and the new-event form's default date follow
+# the calendar too)
+@conditional_view('event', 'event_attendance_summary', vary=lambda: date.today().isoformat())
 def events():
     if request.method == "POST":
         name = request.form.get("name", "").strip()
         date_s = request.form.get("date", "").strip()
         if name and date_s:
-            db.session.add(Event(name=name, date=date_s))
+            ev = Event(name=name, date=date_s)
+            db.session.add(ev)
+            db.session.flush()
+            # nobody has excusals or overrides for a new event yet
+            db.session.add(EventAttendanceSummary(event_id=ev.id, present=Cadet.query.count()))
             db.session.commit()
+            event_catalog.invalidate()
             flash("Event added.")
         return redirect(url_for("events"))
 
-    evs = Event.query.order_by(Event.date).all()
-    # filter out past events for dropdowns
-    today_s = date.today().isoformat()
-    upcoming = [e for e in evs if e.date >= today_s]
-    return render_template("events.html", events=evs, upcoming_events=upcoming)
+    # past/upcoming split comes from the event catalog
+    upcoming = event_catalog.upcoming()
+    evs = event_catalog.past() + upcoming
+    return render_template("events.html", events=evs, upcoming_events=upcoming,
+                           headcounts=event_headcounts([e.id for e in evs]))
+
+
+# Static assets. `flask build-static` copies every file under static/ to
+# static/dist/ under a content-hashed name (style.css ->
+# style.3f2a9c1b04de.css) with precompressed .gz and, when the brotli
+# package is installed, .br variants of text files. With Pillow installed
+# images are re-encoded (losslessly for PNG, at quality 85 for JPEG; the
+# original is kept if that isn't smaller) and downscaled copies, reduced to
+# a 256-colour palette for PNG, are made for each of STATIC_IMAGE_WIDTHS
+# narrower than the original (kept when they are smaller than it). Both
+# packages are imported only by the build. static/dist/manifest.json maps
+# the source names to the built ones. Templates link
+# assets through asset_url()/asset_srcset(), which fall back to the plain
+# /static/ URL for files that have not been built. /assets/ serves the
+# built files with a year-long immutable Cache-Control -- a changed file
+# gets a new name -- and picks the precompressed variant the client
+# accepts, so nothing is compressed per request. Earlier builds are left
+# in place so pages cached by browsers keep working. The manifest is read
+# once per process; restart workers after a build.
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.ico'}
+IMAGE_FORMATS = {'.png': 'PNG', '.jpg': 'JPEG', '.jpeg': 'JPEG'}
+ASSET_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def static_dist_dir():
+    return os.path.join(app.static_folder, 'dist')
+
+
+def _write_atomic(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _fingerprinted(name, data, tag=''):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}{tag}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _optimize_image(data, fmt, width=None):
+    from PIL import Image
+    img = Image.open(BytesIO(data))
+    if width is not None:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+        if fmt == 'PNG':
+            # resampling adds shades that compress badly; a 256-colour
+            # palette brings the copy back under the original's size
+            method = Image.Quantize.FASTOCTREE if 'A' in img.getbands() else Image.Quantize.MEDIANCUT
+            img = img.quantize(256, method=method)
+    out = BytesIO()
+    if fmt == 'JPEG':
+        img.save(out, fmt, quality=85, optimize=True, progressive=True)
+    else:
+        img.save(out, fmt, optimize=True)
+    return out.getvalue()
+
+
+def _emit_asset(out_dir, name, data, tag='', brotli=None):
+    """Write one built file (and its compressed variants) and return its
+    manifest entry."""
+    path = _fingerprinted(name, data, tag)
+    target = os.path.join(out_dir, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    encodings = []
+    if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+        variants = {'gzip': gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        for encoding, suffix in ASSET_ENCODINGS:
+            packed = variants.get(encoding)
+            if packed is not None and len(packed) < len(data):
+                if not os.path.exists(target + suffix):
+                    _write_atomic(target + suffix, packed)
+                encodings.append(encoding)
+    if not os.path.exists(target):
+        _write_atomic(target, data)
+    return {'path': path, 'encodings': encodings, 'size': len(data)}
+
+
+def build_static_assets():
+    """Build static/dist/ and its manifest; returns the manifest."""
+    # optional packages, imported here to keep them out of app start-up
+    try:
+        import brotli
+    except ImportError:  # no .br variants
+        brotli = None
+    try:
+        from PIL import Image
+    except ImportError:  # images are fingerprinted as they are
+        Image = None
+    src_dir, out_dir = app.static_folder, static_dist_dir()
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for root, dirs, files in os.walk(src_dir):
+        if os.path.abspath(root) == os.path.abspath(src_dir):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) != out_dir]
+        for fname in sorted(files):
+            name = os.path.relpath(os.path.join(root, fname), src_dir).replace(os.sep, '/')
+            with open(os.path.join(root, fname), 'rb') as f:
+                data = f.read()
+            fmt = IMAGE_FORMATS.get(os.path.splitext(name)[1].lower())
+            if fmt is None or Image is None:
+                manifest[name] = _emit_asset(out_dir, name, data, brotli=brotli)
+                continue
+            optimized = _optimize_image(data, fmt)
+            if len(optimized) < len(data):
+                data = optimized
+            entry = _emit_asset(out_dir, name, data, brotli=brotli)
+            width = Image.open(BytesIO(data)).width
+            entry['widths'] = {str(width): entry['path']}
+            for w in sorted(set(app.config['STATIC_IMAGE_WIDTHS'])):
+                if w >= width:
+                    continue
+                scaled = _optimize_image(data, fmt, w)
+                if len(scaled) < len(data):  # otherwise the full-size file is the better download
+                    entry['widths'][str(w)] = _emit_asset(out_dir, name, scaled, f'.{w}w', brotli=brotli)['path']
+            manifest[name] = entry
+    _write_atomic(os.path.join(out_dir, 'manifest.json'), json.dumps(manifest, indent=1, sort_keys=True).encode())
+    global _asset_manifest
+    _asset_manifest = None
+    return manifest
+
+
+@app.cli.command('build-static')
+def build_static_command():
+    """Fingerprint and precompress static/ into static/dist/."""
+    manifest = build_static_assets()
+    for name, entry in sorted(manifest.items()):
+        extra = [*entry['encodings'], *(f'{w}w' for w in entry.get('widths', {}))]
+        click.echo(f"{name} -> {entry['path']} ({entry['size']} bytes{'; ' + ', '.join(extra) if extra else ''})")
+
+
+_asset_manifest = None
+
+
+def asset_manifest():
+    global _asset_manifest
+    if _asset_manifest is None:
+        try:
+            with open(os.path.join(static_dist_dir(), 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        # built path -> encodings available for it, for serving
+        manifest_encodings = {e['path']: e['encodings'] for e in manifest.values()}
+        _asset_manifest = (manifest, manifest_encodings)
+    return _asset_manifest
+
+
+@app.template_global()
+def asset_url(name):
+    entry = asset_manifest()[0].get(name)
+    if entry is None:
+        return url_for('static', filename=name)
+    return url_for('asset', filename=entry['path'])
+
+
+@app.template_global()
+def asset_srcset(name):
+    """srcset value listing the built widths of an image ('' if none)."""
+    entry = asset_manifest()[0].get(name)
+    if not entry or len(entry.get('widths', {})) < 2:
+        return ''
+    return ', '.join(f"{url_for('asset', filename=path)} {w}w"
+                     for w, path in sorted(entry['widths'].items(), key=lambda kv: int(kv[0])))
+
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    encodings = asset_manifest()[1].get(filename, ())
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ASSET_ENCODINGS:
+        if encoding in encodings and encoding in request.accept_encodings:
+            resp = send_from_directory(static_dist_dir(), filename + suffix, mimetype=mimetype)
+            resp.headers['Content-Encoding'] = encoding
+            break
+    else:
+        resp = send_from_directory(static_dist_dir(), filename, mimetype=mimetype)
+    resp.headers['Cache-Control'] = ASSET_CACHE_CONTROL
+    if encodings:
+        resp.vary.add('Accept-Encoding')
+    return resp
 
 
 # Diagnostic routes to help debug deployment/static serving
@@ -549,38 +3082,42 @@ def _health():
     return 'OK', 200
 
 
+@app.route('/_metrics')
+@staff_required
+def _metrics():
+    lines = metrics.render()
+    if _fragment_cache is not None:
+        stats = _fragment_cache.stats()
+        lines += ['# TYPE excusal_fragment_cache_hits_total counter',
+                  f'excusal_fragment_cache_hits_total {stats["hits"]}',
+                  '# TYPE excusal_fragment_cache_misses_total counter',
+                  f'excusal_fragment_cache_misses_total {stats["misses"]}',
+                  '# TYPE excusal_fragment_cache_entries gauge',
+                  f'excusal_fragment_cache_entries {stats["entries"]}']
+    if excusal_queue.enabled:
+        lines += ['# TYPE excusal_queue_depth gauge', f'excusal_queue_depth {excusal_queue.depth()}',
+                  '# TYPE excusal_queue_dead_letters gauge', f'excusal_queue_dead_letters {excusal_queue.dead_letters()}']
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/_cache_stats')
+@staff_required
+def _cache_stats():
+    return jsonify(fragment_cache=fragment_cache().stats())
+
+
 @app.route('/test-image')
 def test_image():
-    # returns the excusal PNG directly so you can confirm static serving
-    return send_from_directory(os.path.join(app.root_path, 'static'), 'excusal_form.png')
+    # redirects to the excusal PNG's cacheable URL so you can confirm static serving
+    return redirect(asset_url('excusal_form.png'))
 
 
 # Run app
 if __name__ == "__main__":
     # initialize DB and logging
     with app.app_context():
-        db.create_all()
-        # seed roster from roster.csv if DB has no cadets
-        if Cadet.query.count() == 0:
-            roster_path = os.path.join(app.root_path, 'roster.csv')
-            if os.path.exists(roster_path):
-                with open(roster_path, newline='') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        name = (row.get('names') or row.get('name') or row.get('Name') or '').strip()
-                        if name:
-                            # avoid duplicates
-                            if not Cadet.query.filter_by(name=name).first():
-                                db.session.add(Cadet(name=name, rank=''))
-                    db.session.commit()
-        # seed default events if none
-        if Event.query.count() == 0:
-            db.session.add_all([
-                Event(name='llab', date='2025-09-17'),
-                Event(name='class', date='2025-09-17'),
-                Event(name='2025 FTX', date='2025-10-01'),
-            ])
-            db.session.commit()
+        migrate_db()
+        seed_db()
 
     # set up a rotating file handler for easier debugging
     log_file = os.path.join(app.root_path, 'app.log')
@@ -591,6 +3128,9 @@ if __name__ == "__main__":
     if not app.logger.handlers:
         app.logger.addHandler(handler)
     app.logger.setLevel(logging.DEBUG)
+    # per-request JSON lines go to the same file
+    request_log.addHandler(handler)
+    request_log.setLevel(logging.INFO)
     app.logger.info('Starting ROTC Excusal app')
 
     try:
@@ -0,0 +1,127 @@
+"""Archive two years of synthetic history and check nothing is lost.
+
+Run from the repository root:
+
+    python -m bench.archive [cadets] [excusals]
+
+Generates weekly events over the last two years, moderates the old pending
+excusals except one event's, then runs the archiver (a --limit run
+followed by a full one, as an interrupted nightly job would) and checks
+that the live tables only keep recent events, that a second run changes
+nothing, that headcounts and the include_archived exports match what the
+live tables produced before, that roster changes leave archived headcounts
+alone, and that the default exports leave archived events out.
+"""
+import csv
+import io
+import sys
+import time
+from datetime import date, timedelta
+
+from bench.common import staff_client
+from bench.datagen import generate
+from app import (app, db, archive_cutoff, archive_past_events, event_headcounts, recount_event_summaries,  # noqa: E402
+                 AttendanceOverride, AttendanceOverrideArchive, Event, Excusal, ExcusalArchive)
+
+
+def csv_rows(resp):
+    return list(csv.reader(io.StringIO(resp.get_data(as_text=True))))
+
+
+def timed(client, url):
+    t0 = time.perf_counter()
+    resp = client.get(url)
+    resp.get_data()
+    return resp, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    cadets = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    excusals = int(sys.argv[2]) if len(sys.argv) > 2 else 40000
+    failures = 0
+
+    def check(label, ok):
+        nonlocal failures
+        failures += not ok
+        print(f'{label}: {"yes" if ok else "NO"}')
+
+    client = staff_client(app)
+    with app.app_context():
+        _, event_ids = generate(cadets=cadets, events=104, excusals=excusals, overrides=5000,
+                                start=date.today() - timedelta(days=7 * 100))
+        cutoff = archive_cutoff()
+        old = [e for e, in db.session.query(Event.id).filter(Event.date < cutoff).order_by(Event.date)]
+        # staff have long since moderated the old queue, except for one event
+        db.session.execute(db.update(Excusal).where(Excusal.event_id.in_(old[1:]), Excusal.status == 'pending')
+                           .values(status='approved'), execution_options={'attendance_events': old[1:]})
+        recount_event_summaries(old)
+        db.session.commit()
+
+        headcounts = event_headcounts(event_ids)
+        matrix = csv_rows(client.get('/attendance_matrix'))
+        excusal_rows = sorted(map(tuple, csv_rows(client.get('/export_excusals'))[1:]))
+        attendance = csv_rows(client.get(f'/export_attendance?event_id={old[-1]}'))
+        before, before_ms = timed(client, '/export_excusals')
+        live_before = Excusal.query.count(), AttendanceOverride.query.count()
+
+        dry = archive_past_events(cutoff, dry_run=True)
+        t0 = time.perf_counter()
+        first = archive_past_events(cutoff, limit=5)
+        rest = archive_past_events(cutoff)
+        elapsed = (time.perf_counter() - t0) * 1000
+        print(f'{len(old)} events before {cutoff}; archived {first["events"]} + {rest["events"]} events, '
+              f'{first["excusals"] + rest["excusals"]} excusals, {first["overrides"] + rest["overrides"]} overrides '
+              f'in {elapsed:.0f} ms; skipped (pending) {rest["skipped_pending"]}')
+        live_after = Excusal.query.count(), AttendanceOverride.query.count()
+        print(f'live excusals/overrides: {live_before} -> {live_after}')
+
+        check('dry run predicted the move', (dry['events'], dry['excusals'], dry['overrides']) == (
+            first['events'] + rest['events'], first['excusals'] + rest['excusals'],
+            first['overrides'] + rest['overrides']))
+        check('event with pending excusals stayed live', rest['skipped_pending'] == 1
+              and db.session.get(Event, old[0]).archived_at is None)
+        check('rows moved, none lost', live_after[0] + ExcusalArchive.query.count() == live_before[0]
+              and live_after[1] + AttendanceOverrideArchive.query.count() == live_before[1])
+        check('live tables keep no archived events', not Excusal.query.join(Event, Event.id == Excusal.event_id)
+              .filter(Event.archived_at.isnot(None)).count())
+        again = archive_past_events(cutoff)
+        check('second run changes nothing', (again['events'], again['excusals'], again['overrides']) == (0, 0, 0))
+
+        check('headcounts unchanged', event_headcounts(event_ids) == headcounts)
+        recount_event_summaries()
+        db.session.commit()
+        check('full recount agrees', event_headcounts(event_ids) == headcounts)
+
+    check('matrix with include_archived unchanged',
+          csv_rows(client.get('/attendance_matrix?include_archived=1')) == matrix)
+    live_matrix = csv_rows(client.get('/attendance_matrix'))
+    check('default matrix leaves archived events out', len(live_matrix[0]) == len(matrix[0]) - dry['events'])
+    check('excusal export with include_archived unchanged',
+          sorted(map(tuple, csv_rows(client.get('/export_excusals?include_archived=1'))[1:])) == excusal_rows)
+    check('archived event needs include_archived',
+          client.get(f'/export_attendance?event_id={old[-1]}').status_code == 302
+          and csv_rows(client.get(f'/export_attendance?event_id={old[-1]}&include_archived=1')) == attendance)
+    check('whoiscoming no longer lists archived events',
+          f'<option value="{old[-1]}" ' not in client.get('/whoiscoming').get_data(as_text=True))
+
+    with app.app_context():
+        # roster changes leave archived headcounts alone and keep live ones exact
+        excused = db.session.query(ExcusalArchive.cadet_id).filter(ExcusalArchive.status == 'approved').first()[0]
+        client.post('/roster', data={'action': 'delete', 'cadet_id': excused})
+        client.post('/roster', data={'action': 'add', 'name': 'Newly Joined'})
+        archived = [e for e, in db.session.query(Event.id).filter(Event.archived_at.isnot(None))]
+        after_roster = event_headcounts(event_ids)
+        check('archived headcounts frozen through roster changes',
+              all(after_roster[e] == headcounts[e] for e in archived))
+        recount_event_summaries()
+        db.session.commit()
+        check('live headcounts match a full recount', event_headcounts(event_ids) == after_roster)
+
+    after, after_ms = timed(client, '/export_excusals')
+    print(f'/export_excusals: {len(before.get_data())} bytes in {before_ms:.0f} ms -> '
+          f'{len(after.get_data())} bytes in {after_ms:.0f} ms')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
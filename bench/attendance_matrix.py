@@ -0,0 +1,50 @@
+"""Timing for /attendance_matrix on a 500-cadet x 60-event semester.
+
+Run from the repository root:
+
+    python -m bench.attendance_matrix
+"""
+import sys
+import time
+
+from bench.common import staff_client
+from app import app, db, Cadet, Event, Excusal, AttendanceOverride  # noqa: E402
+
+CADETS = 500
+EVENTS = 60
+
+
+def seed():
+    db.create_all()
+    cadets = [Cadet(name=f'Cadet {i:04d}', rank='') for i in range(CADETS)]
+    events = [Event(name=f'llab {j:02d}', date=f'2025-{1 + j // 28:02d}-{1 + j % 28:02d}') for j in range(EVENTS)]
+    db.session.add_all(cadets + events)
+    db.session.flush()
+    for i, c in enumerate(cadets):
+        for j, e in enumerate(events):
+            if (i + j) % 7 == 0:
+                db.session.add(Excusal(cadet_id=c.id, event_id=e.id, name=c.name, event=e.name, excused_from=e.name, date=e.date,
+                                       status=('pending', 'approved', 'denied')[(i + j) % 3]))
+            elif (i * j) % 31 == 1:
+                db.session.add(AttendanceOverride(cadet_id=c.id, event_id=e.id, status='unknown'))
+    db.session.commit()
+
+
+def main():
+    with app.app_context():
+        seed()
+        client = staff_client(app)
+        worst = 0.0
+        for fmt in ('csv', 'json'):
+            start = time.perf_counter()
+            resp = client.get(f'/attendance_matrix?format={fmt}')
+            body = resp.get_data()
+            elapsed = time.perf_counter() - start
+            assert resp.status_code == 200, resp.status_code
+            worst = max(worst, elapsed)
+            print(f'{CADETS}x{EVENTS} {fmt:<4} {len(body):>8} bytes  {elapsed * 1000:8.1f} ms')
+    return 0 if worst < 1.0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Query-count benchmark for the attendance resolution used by /whoiscoming
+and /export_attendance.
+
+Run from the repository root:
+
+    python -m bench.attendance_queries
+
+Builds a throwaway SQLite database, grows the roster from 100 to 10k cadets
+and checks that loading each page issues the same number of SQL statements
+at every size.
+"""
+import sys
+import time
+
+from bench.common import staff_client
+from sqlalchemy import event as sa_event
+
+from app import app, db, Cadet, Event, Excusal, AttendanceOverride  # noqa: E402
+
+SIZES = (100, 1000, 10000)
+
+
+def grow_roster(target):
+    have = Cadet.query.count()
+    ev = Event.query.first()
+    new = []
+    for i in range(have, target):
+        new.append(Cadet(name=f'Cadet {i:05d}', rank=''))
+    db.session.add_all(new)
+    db.session.flush()
+    # every third new cadet has an excusal, every tenth an override
+    for i, c in enumerate(new):
+        if i % 3 == 0:
+            db.session.add(Excusal(cadet_id=c.id, event_id=ev.id, name=c.name, event=ev.name, excused_from=ev.name,
+                                   date='2025-09-01', status='pending', reason='bench'))
+        if i % 10 == 0:
+            db.session.add(AttendanceOverride(cadet_id=c.id, event_id=ev.id, status='excused'))
+    db.session.commit()
+
+
+def count_queries(client, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa_event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        start = time.perf_counter()
+        resp = client.get(url)
+        elapsed = time.perf_counter() - start
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    assert resp.status_code == 200, resp.status_code
+    return len(statements), elapsed
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        db.session.add(Event(name='llab', date='2099-01-01'))
+        db.session.commit()
+        ev_id = Event.query.first().id
+
+        client = staff_client(app)
+
+        # warm per-process caches (event catalog) so only per-request work is counted
+        client.get(f'/whoiscoming?event_id={ev_id}')
+
+        counts = {}
+        for size in SIZES:
+            grow_roster(size)
+            for url in (f'/whoiscoming?event_id={ev_id}', f'/export_attendance?event_id={ev_id}'):
+                n, elapsed = count_queries(client, url)
+                counts.setdefault(url, []).append(n)
+                print(f'{size:>6} cadets  {url:<35} {n:>3} queries  {elapsed * 1000:8.1f} ms')
+
+    ok = all(len(set(v)) == 1 for v in counts.values())
+    print('query count constant across roster sizes:', 'yes' if ok else 'NO')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
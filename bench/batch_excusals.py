@@ -0,0 +1,76 @@
+"""Excuse a squad from one event: one /excusal form POST per cadet vs. one
+POST /excusals with all of them. Also checks the per-item answers, the
+stored rows, cadet statuses and headcounts.
+
+Run from the repository root:
+
+    python -m bench.batch_excusals [squad_size]
+"""
+import sys
+import time
+
+from bench.common import staff_client
+from bench.datagen import generate
+from bench.http_cache import count_queries
+from app import app, db, event_headcounts, recount_event_summaries, Cadet, Excusal  # noqa: E402
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    failures = 0
+
+    def check(label, ok):
+        nonlocal failures
+        failures += not ok
+        print(f'{label}: {"yes" if ok else "NO"}')
+
+    with app.app_context():
+        names, event_ids = generate(cadets=3 * n, events=3, excusals=500, overrides=50)
+    client = staff_client(app)
+    single_names, batch_names = names[:n], names[n:2 * n]
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        queries = 0
+        for name in single_names:
+            _, q = count_queries(lambda: client.post('/excusal', data={
+                'name': name, 'event_id': event_ids[0], 'date': '2099-01-01', 'reason': 'squad FTX'}))
+            queries += q
+        single = time.perf_counter() - t0
+        print(f'{n} form submissions:     {single * 1000:8.1f} ms  {queries:6d} queries')
+
+        payload = {'event_id': event_ids[1], 'date': '2099-01-01', 'reason': 'squad FTX',
+                   'excusals': [{'name': name.upper() if i % 7 == 0 else name} for i, name in enumerate(batch_names)]
+                   + [{'name': 'Nobody Atall'}, {'name': batch_names[0], 'event_id': 9999}, {'reason': 'no name'},
+                      {'name': batch_names[0], 'reason': {'x': 1}}, {'name': batch_names[0], 'reason': 'x' * 301}]}
+        t0 = time.perf_counter()
+        resp, q = count_queries(lambda: client.post('/excusals', json=payload))
+        batch = time.perf_counter() - t0
+        body = resp.get_json()
+        print(f'one batch of {n} excusals: {batch * 1000:8.1f} ms  {q:6d} queries')
+
+        check('batch answered per item', resp.status_code == 200 and body['created'] == n
+              and [r['status'] for r in body['results'][n:]] == ['unknown_name'] + ['invalid'] * 4
+              and all(r['status'] == 'created' for r in body['results'][:n]))
+        check('one excusal row per created item',
+              Excusal.query.filter_by(event_id=event_ids[1], reason='squad FTX').count() == n)
+        check('squad marked pending', db.session.query(Cadet.status).filter(Cadet.name.in_(batch_names))
+              .distinct().all() == [('pending',)])
+        check('batch under a second', batch < 1.0)
+        incremental = {e: dict(c) for e, c in event_headcounts(event_ids).items()}
+        recount_event_summaries()
+        db.session.commit()
+        check('headcounts match a full recount', incremental == {e: dict(c) for e, c in event_headcounts(event_ids).items()})
+
+    for bad in ({}, {'excusals': 'x'}, {'excusals': [1]}, {'excusals': [{'name': 'x'}] * 1001},
+                {'reason': {}, 'excusals': [{'name': batch_names[0]}]},
+                {'reason': 'x' * 301, 'excusals': [{'name': batch_names[0]}]},
+                {'event_id': 9999, 'excusals': [{'name': batch_names[0]}]},
+                {'event_id': [1], 'excusals': [{'name': batch_names[0]}]}):
+        check(f'rejected with 400: {str(bad)[:40]}', client.post('/excusals', json=bad).status_code == 400)
+    check('requires staff login', app.test_client().post('/excusals', json=payload).status_code == 401)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
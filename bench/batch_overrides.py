@@ -0,0 +1,81 @@
+"""Mark a formation of cadets on /whoiscoming: one form POST (plus the page
+reload it redirects to) per cadet vs. one /attendance_overrides request.
+Also checks the headcounts and the changed-rows answer.
+
+Run from the repository root:
+
+    python -m bench.batch_overrides [cadets_marked]
+"""
+import sys
+import time
+
+from bench.common import staff_client
+from bench.datagen import generate
+from bench.http_cache import count_queries
+from app import app, db, event_headcounts, recount_event_summaries  # noqa: E402
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    failures = 0
+    with app.app_context():
+        generate(cadets=500, events=3, excusals=300, overrides=50)
+    client = staff_client(app)
+    cadet_ids = list(range(1, n + 1))
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        queries = 0
+        for c in cadet_ids:
+            resp, q = count_queries(lambda: client.post('/whoiscoming?event_id=1', follow_redirects=True, data={
+                'override_action': 'update', 'cadet_id': c, 'event_id': 1, 'status': 'excused'}))
+            queries += q
+        single = time.perf_counter() - t0
+        print(f'{n} single overrides + reloads: {single * 1000:8.1f} ms  {queries:5d} queries')
+
+        payload = {'event_id': 2, 'overrides': [{'cadet_id': c, 'status': 'excused'} for c in cadet_ids]}
+        t0 = time.perf_counter()
+        resp, q = count_queries(lambda: client.post('/attendance_overrides', json=payload))
+        batch = time.perf_counter() - t0
+        changed = resp.get_json()['changed']
+        print(f'one batch of {n} overrides:   {batch * 1000:8.1f} ms  {q:5d} queries  {len(changed)} rows changed')
+        ok = resp.status_code == 200 and all(c['status'] == 'excused' for c in changed) and \
+            len(changed) == sum(1 for c in changed if c['previous'] != 'excused')
+        failures += not ok
+
+        resp = client.post('/attendance_overrides', json=payload)
+        ok = resp.get_json()['changed'] == []
+        failures += not ok
+        print(f'repeating the batch changes nothing: {"yes" if ok else "NO"}')
+
+        mixed = {'event_id': 2, 'overrides': [{'cadet_id': 1, 'status': 'present'}, {'cadet_id': 2, 'status': 'unknown'}]}
+        changed = client.post('/attendance_overrides', json=mixed).get_json()['changed']
+        ok = [(c['cadet_id'], c['status']) for c in changed] == [(1, 'present'), (2, 'unknown')]
+        failures += not ok
+        print(f'mixed statuses answered with just those rows: {"yes" if ok else "NO"}')
+
+        incremental = {e: dict(c) for e, c in event_headcounts([1, 2, 3]).items()}
+        recount_event_summaries()
+        db.session.commit()
+        ok = incremental == {e: dict(c) for e, c in event_headcounts([1, 2, 3]).items()}
+        failures += not ok
+        print(f'headcounts match a full recount: {"yes" if ok else "NO"}')
+
+    for bad in ({'event_id': 999, 'overrides': [{'cadet_id': 1, 'status': 'excused'}]},
+                {'event_id': 1, 'overrides': [{'cadet_id': 1, 'status': 'asleep'}]},
+                {'event_id': 1, 'overrides': [{'cadet_id': 99999, 'status': 'excused'}]},
+                {'event_id': 1, 'overrides': [{'status': 'excused'}]},
+                [{'cadet_id': 1, 'status': 'excused'}],
+                {'event_id': 1, 'overrides': ['excused']}):
+        resp = client.post('/attendance_overrides', json=bad)
+        ok = resp.status_code == 400
+        failures += not ok
+        print(f'rejected with 400: {resp.get_json()["error"]!r:<40} {"ok" if ok else "FAIL"}')
+    ok = app.test_client().post('/attendance_overrides', json=payload).status_code == 401
+    failures += not ok
+    print(f'requires staff login: {"yes" if ok else "NO"}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""Shared setup for the benchmark scripts.
+
+Importing this module points DATABASE_URL at a throwaway SQLite file (and
+ROSTER_CSV_PATH at a copy of roster.csv), so it must be imported before
+``app``.
+"""
+import os
+import shutil
+import tempfile
+
+BENCH_DIR = tempfile.mkdtemp(prefix='excusal-bench-')
+# BENCH_DATABASE_URL can point at a scratch Postgres database instead (it gets written to)
+os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL') or 'sqlite:///' + os.path.join(BENCH_DIR, 'bench.db')
+os.environ['ROSTER_CSV_PATH'] = os.path.join(BENCH_DIR, 'roster.csv')
+os.environ.setdefault('FRAGMENT_CACHE_URL', 'memory')
+shutil.copy(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'roster.csv'),
+            os.environ['ROSTER_CSV_PATH'])
+
+
+def staff_client(app):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['staff_logged_in'] = True
+    return client
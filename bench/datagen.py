@@ -0,0 +1,84 @@
+"""Synthetic data for the benchmarks: N cadets, M events and K excusals and
+overrides, inserted in bulk into whatever DATABASE_URL points at (the
+throwaway SQLite file set up by bench.common unless BENCH_DATABASE_URL names
+a scratch Postgres database). Deterministic for a given seed.
+
+Can also be run on its own to fill a database:
+
+    python -m bench.datagen --cadets 2000 --events 40 --excusals 5000 --overrides 1000
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+import bench.common  # noqa: F401  (sets DATABASE_URL)
+from app import (app, db, migrate_db, normalize_name, recount_event_summaries, Cadet, Event, Excusal,
+                 AttendanceOverride)
+
+FIRST = ['Alex', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Avery', 'Quinn', 'Rowan', 'Sage',
+         'Mateo', 'Karina', 'Isaac', 'Noelle', 'Priya', 'Diego', 'Hana', 'Omar', 'Lena', 'Victor']
+LAST = ['Kamarck', 'Repina', 'Verbrugge', 'Buchan', 'Nguyen', 'Okafor', 'Silva', 'Kowalski', 'Haddad',
+        'Larsen', 'Moreau', 'Tanaka', 'Fischer', 'Castillo', 'Ibrahim', 'Novak', 'Reyes', 'Park']
+EVENT_NAMES = ['llab', 'class', 'PT', 'FTX', 'Dining Out', 'Field Day']
+COMPANIES = ['Alpha', 'Bravo', 'Charlie', 'Delta']
+EXCUSAL_STATUSES = ['pending', 'pending', 'approved', 'denied']
+OVERRIDE_STATUSES = ['present', 'excused', 'unknown']
+
+
+def cadet_name(i):
+    return f'{FIRST[i % len(FIRST)]} {LAST[(i // len(FIRST)) % len(LAST)]} {i:05d}'
+
+
+def _insert(model, rows, size=2000):
+    for i in range(0, len(rows), size):
+        db.session.execute(db.insert(model), rows[i:i + size])
+
+
+def generate(cadets=1000, events=30, excusals=2000, overrides=500, seed=1, start=None):
+    """Fill an empty database and return the generated cadet names and event ids."""
+    rng = random.Random(seed)
+    start = start or date.today() - timedelta(days=events // 2 * 7)
+    migrate_db()
+    names = [cadet_name(i) for i in range(cadets)]
+    _insert(Cadet, [{'name': n, 'name_normalized': normalize_name(n), 'rank': rng.choice(['C/4C', 'C/3C', 'C/2C', 'C/1C']),
+                     'status': 'present'} for n in names])
+    _insert(Event, [{'name': EVENT_NAMES[i % len(EVENT_NAMES)], 'date': (start + timedelta(days=7 * i)).isoformat()}
+                    for i in range(events)])
+    db.session.flush()
+    cadet_ids = [i for (i,) in db.session.query(Cadet.id).order_by(Cadet.id)]
+    event_rows = db.session.query(Event.id, Event.name, Event.date).order_by(Event.id).all()
+
+    rows = []
+    for _ in range(excusals):
+        idx = rng.randrange(cadets)
+        ev = rng.choice(event_rows)
+        rows.append({'cadet_id': cadet_ids[idx], 'event_id': ev.id, 'name': names[idx], 'event': ev.name,
+                     'excused_from': ev.name, 'date': ev.date, 'company': rng.choice(COMPANIES),
+                     'cpt': '', 'reason': 'synthetic', 'makeup_plan': '', 'poc': '', 'position': '',
+                     'phone': '', 'email': '', 'status': rng.choice(EXCUSAL_STATUSES)})
+    _insert(Excusal, rows)
+
+    pairs = rng.sample([(c, e.id) for c in cadet_ids for e in event_rows], min(overrides, cadets * events))
+    _insert(AttendanceOverride, [{'cadet_id': c, 'event_id': e, 'status': rng.choice(OVERRIDE_STATUSES)}
+                                 for c, e in pairs])
+    recount_event_summaries()
+    db.session.commit()
+    return names, [e.id for e in event_rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cadets', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=30)
+    parser.add_argument('--excusals', type=int, default=2000)
+    parser.add_argument('--overrides', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    with app.app_context():
+        generate(args.cadets, args.events, args.excusals, args.overrides, args.seed)
+        print(f'{Cadet.query.count()} cadets, {Event.query.count()} events, {Excusal.query.count()} excusals, '
+              f'{AttendanceOverride.query.count()} overrides in {db.engine.url.render_as_string()}')
+
+
+if __name__ == '__main__':
+    main()
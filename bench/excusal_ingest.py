@@ -0,0 +1,133 @@
+"""Excusal submission storm, synchronous vs. queued ingestion.
+
+Many threads POST /excusal at once; the script reports acknowledgement
+latency for both modes, then checks that the queue drains into the same
+result (one excusal per submission, cadets marked pending), that queued
+submissions show on /pending_excusals, that a submission which can't be
+stored is retried and then dead-lettered without holding up the ones
+queued behind it, and that replayed batches are not inserted twice.
+
+Run from the repository root:
+
+    python -m bench.excusal_ingest [threads] [submissions_per_thread]
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from bench.common import BENCH_DIR
+from bench.datagen import generate
+from bench.loadtest import percentile
+from app import app, db, excusal_queue, commit_excusals, Cadet, Excusal  # noqa: E402
+
+
+def storm(names, event_ids, threads, per_thread):
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        for _ in range(per_thread):
+            t0 = time.perf_counter()
+            resp = client.post('/excusal', data={'name': rng.choice(names), 'event_id': rng.choice(event_ids),
+                                                 'reason': 'storm'})
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+                if resp.status_code != 302 or 'pending_excusals' not in resp.headers.get('Location', ''):
+                    errors.append(resp.status_code)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    total = threads * per_thread
+    failures = 0
+    logging.getLogger('excusal.requests').setLevel(logging.ERROR)
+    with app.app_context():
+        names, event_ids = generate(cadets=1000, events=20, excusals=0, overrides=0)
+
+    for mode in ('sync', 'queued'):
+        app.config['EXCUSAL_QUEUE_PATH'] = os.path.join(BENCH_DIR, 'queue.db') if mode == 'queued' else ''
+        with app.app_context():
+            before = Excusal.query.count()
+        latencies, errors, elapsed = storm(names, event_ids, threads, per_thread)
+        t0 = time.perf_counter()
+        if mode == 'queued':
+            while excusal_queue.depth():
+                time.sleep(0.05)
+        drained = time.perf_counter() - t0
+        with app.app_context():
+            added = Excusal.query.count() - before
+        ok = not errors and added == total
+        failures += not ok
+        print(f'{mode:<7} {total} submissions from {threads} threads: ack p50 {percentile(latencies, 50):7.2f} ms  '
+              f'p95 {percentile(latencies, 95):7.2f} ms  {total / elapsed:7.1f} acks/s  '
+              f'drained +{drained:.2f}s  stored {added}  {"ok" if ok else "FAIL"}')
+
+    with app.app_context():
+        stray = Cadet.query.filter(Cadet.id.in_(db.session.query(Excusal.cadet_id)), Cadet.status != 'pending').count()
+    failures += bool(stray)
+    print(f'cadets with an excusal not marked pending: {stray}')
+
+    # with no worker threads a submission stays queued and is shown as such
+    excusal_queue.stop()
+    app.config['EXCUSAL_QUEUE_WORKERS'] = 0
+    client = app.test_client()
+    client.post('/excusal', data={'name': names[0], 'event_id': event_ids[0]})
+    page = client.get('/pending_excusals').get_data(as_text=True)
+    ok = 'status-badge queued' in page
+    failures += not ok
+    print(f'queued submission visible on /pending_excusals: {"yes" if ok else "NO"}')
+    excusal_queue.drain()
+    page = client.get('/pending_excusals').get_data(as_text=True)
+    ok = 'status-badge pending' in page and 'status-badge queued' not in page
+    failures += not ok
+    print(f'shown as pending once committed: {"yes" if ok else "NO"}')
+
+    # a submission that can't be stored doesn't hold up the ones behind it
+    logging.getLogger(app.logger.name).setLevel(logging.CRITICAL)
+    excusal_queue.MAX_ATTEMPTS = 2
+    with app.app_context():
+        cadet = Cadet.query.first()
+        good = {'submission_token': 'behind-bad', 'cadet_id': cadet.id, 'event_id': event_ids[0], 'name': cadet.name,
+                'status': 'pending'}
+    excusal_queue.enqueue({'submission_token': 'bad', 'event_id': event_ids[0], 'name': 'no cadet id'})
+    excusal_queue.enqueue(good)
+    excusal_queue.drain()
+    with app.app_context():
+        ok = Excusal.query.filter_by(submission_token='behind-bad').count() == 1 and excusal_queue.depth() == 1
+        # the bad one waits out its backoff, fails again and is dead-lettered
+        conn = excusal_queue._connect()
+        conn.execute('UPDATE submission SET retry_at = NULL')
+        conn.close()
+        excusal_queue.drain()
+        ok = ok and excusal_queue.depth() == 0 and excusal_queue.dead_letters() == 1 and \
+            list(excusal_queue.failed(['bad'])) == ['bad']
+    failures += not ok
+    print(f'bad submission retried, then dead-lettered without blocking the queue: {"yes" if ok else "NO"}')
+
+    with app.app_context():
+        cadet = Cadet.query.first()
+        payload = {'submission_token': 'replayed', 'cadet_id': cadet.id, 'event_id': event_ids[0], 'name': cadet.name,
+                   'status': 'pending'}
+        n = commit_excusals([dict(payload)]) + commit_excusals([dict(payload)])
+        ok = n == 1 and Excusal.query.filter_by(submission_token='replayed').count() == 1
+    failures += not ok
+    print(f'replayed batch inserted once: {"yes" if ok else "NO"}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Check that conditional GETs on the staff read views are answered with 304
+after a single data-version lookup, and that writes invalidate them (also
+within the one-second resolution of Last-Modified).
+
+Run from the repository root:
+
+    python -m bench.http_cache
+"""
+import sys
+import time
+
+from bench.common import staff_client
+from sqlalchemy import event as sa_event
+import app as app_module  # noqa: E402
+from app import app, db  # noqa: E402
+
+URLS = ['/whoiscoming?event_id=1', '/roster', '/events', '/pending_excusals',
+        '/export_roster', '/export_excusals', '/export_attendance?event_id=1', '/attendance_matrix']
+
+
+def count_queries(fn):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa_event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        resp = fn()
+        resp.get_data()
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return resp, len(statements)
+
+
+def main():
+    failures = 0
+    with app.app_context():
+        db.create_all()
+        client = staff_client(app)
+        client.post('/events', data={'name': 'llab', 'date': '2099-01-01'})
+        client.post('/roster', data={'action': 'add', 'name': 'Cadet One'})
+        client.get('/events')  # consume flashes
+
+        for url in URLS:
+            first = client.get(url)
+            first.get_data()
+            etag = first.headers.get('ETag')
+            resp, n = count_queries(lambda: client.get(url, headers={'If-None-Match': etag}))
+            ok = resp.status_code == 304 and n == 1
+            failures += not ok
+            print(f'{url:<32} 304={resp.status_code == 304} queries={n} {"ok" if ok else "FAIL"}')
+
+        # a write must change the validator
+        etag = client.get('/roster').headers.get('ETag')
+        client.post('/roster', data={'action': 'add', 'name': 'Cadet Two'})
+        client.get('/roster')  # consume flash
+        resp = client.get('/roster', headers={'If-None-Match': etag})
+        ok = resp.status_code == 200
+        failures += not ok
+        print(f'{"/roster after add":<32} status={resp.status_code} {"ok" if ok else "FAIL"}')
+
+        # Last-Modified has whole-second resolution: a date handed out right
+        # after a write must not hide another write in the same second
+        stale = 0
+        for i in range(20):
+            client.post('/roster', data={'action': 'add', 'name': f'Cadet Same Second {i}'})
+            client.get('/roster')  # consume flash
+            since = client.get('/roster').headers.get('Last-Modified')
+            client.post('/roster', data={'action': 'add', 'name': f'Cadet Same Second {i}b'})
+            client.get('/roster')
+            if since and client.get('/roster', headers={'If-Modified-Since': since}).status_code == 304:
+                stale += 1
+        ok = not stale
+        failures += not ok
+        print(f'{"/roster same-second write":<32} stale 304s={stale} {"ok" if ok else "FAIL"}')
+
+        # /events shows today's date: the next day must not revalidate
+        etag = client.get('/events').headers.get('ETag')
+        real_date = app_module.date
+
+        class Tomorrow(real_date):
+            @classmethod
+            def today(cls):
+                return real_date.today() + app_module.timedelta(days=1)
+
+        app_module.date = Tomorrow
+        try:
+            resp = client.get('/events', headers={'If-None-Match': etag})
+        finally:
+            app_module.date = real_date
+        ok = resp.status_code == 200
+        failures += not ok
+        print(f'{"/events on the next day":<32} status={resp.status_code} {"ok" if ok else "FAIL"}')
+
+        time.sleep(1.1)
+        since = client.get('/roster').headers.get('Last-Modified')
+        resp = client.get('/roster', headers={'If-Modified-Since': since or ''})
+        ok = resp.status_code == 304
+        failures += not ok
+        print(f'{"/roster If-Modified-Since":<32} status={resp.status_code} {"ok" if ok else "FAIL"}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Check the request/SQL instrumentation: /_metrics output, N+1 detection and
+the per-request overhead of leaving it switched on.
+
+Run from the repository root:
+
+    python -m bench.instrumentation [requests]
+"""
+import logging
+import sys
+import time
+
+from bench.common import staff_client
+from app import app, db, Cadet, Event  # noqa: E402
+
+
+# registered before the first request; loads cadets one at a time on purpose
+@app.route('/_bench_n_plus_one')
+def _bench_n_plus_one():
+    ids = [i for (i,) in db.session.query(Cadet.id).all()]
+    return str(sum(len(db.session.get(Cadet, i).name) for i in ids))
+
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def timed(client, url, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        client.get(url).get_data()
+    return (time.perf_counter() - start) / n * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    failures = 0
+    capture = Capture()
+    logging.getLogger('excusal.requests').addHandler(capture)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Cadet(name=f'Cadet {i:03d}') for i in range(50)])
+        db.session.add(Event(name='llab', date='2099-01-01'))
+        db.session.commit()
+    client = staff_client(app)
+
+    client.get('/_bench_n_plus_one')
+    flagged = [r for r in capture.records if 'n_plus_one' in r.getMessage()]
+    ok = bool(flagged) and flagged[-1].levelno == logging.WARNING
+    failures += not ok
+    print(f'N+1 loop flagged in request log: {"yes" if ok else "NO"}')
+
+    client.get('/whoiscoming?event_id=1')
+    body = client.get('/_metrics').get_data(as_text=True)
+    for needle in ('excusal_request_duration_seconds_bucket{endpoint="whoiscoming",method="GET",le="+Inf"} 1',
+                   'excusal_n_plus_one_total{endpoint="_bench_n_plus_one"} 1',
+                   'excusal_request_queries_count{endpoint="whoiscoming"} 1'):
+        ok = needle in body
+        failures += not ok
+        print(f'/_metrics has {needle.split("{")[0]:<40} {"ok" if ok else "MISSING"}')
+    resp = app.test_client().get('/_metrics')
+    ok = resp.status_code == 302
+    failures += not ok
+    print(f'/_metrics without staff login redirects: {"yes" if ok else "NO"}')
+
+    for url in ('/whoiscoming?event_id=1', '/roster'):
+        timed(client, url, 20)
+        app.config['METRICS_ENABLED'] = False
+        off = timed(client, url, n)
+        app.config['METRICS_ENABLED'] = True
+        on = timed(client, url, n)
+        print(f'{url:<28} off {off:7.3f} ms  on {on:7.3f} ms  overhead {on - off:+.3f} ms/request')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Scripted load scenarios against a synthetic database, driven through
+Flask's test client (no network, no server). Reports p50/p95 latency,
+throughput and SQL queries per request for each scenario and writes the
+numbers to a JSON file so runs can be compared between commits.
+
+Run from the repository root:
+
+    python -m bench.loadtest [--cadets N] [--events M] [--excusals K] [--overrides K]
+                             [--requests R] [--out results.json] [--compare old.json]
+
+Requests are issued one at a time, so throughput is requests per second of
+a single worker.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from bench.common import staff_client
+from bench.datagen import generate, cadet_name
+from sqlalchemy import event as sa_event
+from app import app, db  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+# Each scenario is (name, share of --requests, step); step(ctx, i) issues one
+# request and returns the response.
+def submit_excusal(ctx, i):
+    ev = ctx['rng'].choice(ctx['event_ids'])
+    return ctx['public'].post('/excusal', data={'name': ctx['rng'].choice(ctx['names']), 'event_id': ev,
+                                                'company': 'Alpha', 'reason': 'load test'})
+
+
+def whoiscoming(ctx, i):
+    return ctx['staff'].get(f'/whoiscoming?event_id={ctx["rng"].choice(ctx["event_ids"])}')
+
+
+def bulk_approve(ctx, i):
+    return ctx['staff'].post('/moderate_excusals', json={'action': ctx['rng'].choice(['approve', 'deny']),
+                                                         'event_id': ctx['rng'].choice(ctx['event_ids'])})
+
+
+def roster_reload(ctx, i):
+    # every reload adds a handful of new cadets on top of the full roster
+    ctx['extra'] += 5
+    names = ctx['names'] + [cadet_name(len(ctx['names']) + n) for n in range(ctx['extra'])]
+    with open(app.config['ROSTER_CSV_PATH'], 'w', newline='') as f:
+        f.write('names\n' + '\n'.join(names) + '\n')
+    return ctx['staff'].post('/roster', data={'action': 'reload_csv'})
+
+
+def export(path):
+    def step(ctx, i):
+        return ctx['staff'].get(path(ctx))
+    return step
+
+
+SCENARIOS = [
+    ('submit_excusal', 1.0, submit_excusal),
+    ('whoiscoming', 1.0, whoiscoming),
+    ('bulk_approve', 0.1, bulk_approve),
+    ('roster_reload', 0.05, roster_reload),
+    ('export_roster', 0.1, export(lambda ctx: '/export_roster')),
+    ('export_excusals', 0.1, export(lambda ctx: '/export_excusals')),
+    ('export_attendance', 0.1, export(lambda ctx: f'/export_attendance?event_id={ctx["rng"].choice(ctx["event_ids"])}')),
+    ('attendance_matrix', 0.05, export(lambda ctx: '/attendance_matrix')),
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def run_scenario(ctx, step, n):
+    counter = [0]
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    latencies, queries, errors = [], [], 0
+    sa_event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        started = time.perf_counter()
+        for i in range(n):
+            counter[0] = 0
+            t0 = time.perf_counter()
+            resp = step(ctx, i)
+            resp.get_data()  # drain streamed bodies
+            latencies.append((time.perf_counter() - t0) * 1000)
+            queries.append(counter[0])
+            errors += resp.status_code >= 400
+        elapsed = time.perf_counter() - started
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', count)
+    return {
+        'requests': n,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'max_ms': round(max(latencies), 3),
+        'throughput_rps': round(n / elapsed, 1),
+        'queries_per_request': round(sum(queries) / n, 2),
+        'max_queries': max(queries),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cadets', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=30)
+    parser.add_argument('--excusals', type=int, default=2000)
+    parser.add_argument('--overrides', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=200, help='requests for the heaviest scenarios')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', action='append', help='run just this scenario (repeatable)')
+    parser.add_argument('--out', help='results file (default bench/results/loadtest-<commit>-<time>.json)')
+    parser.add_argument('--compare', help='earlier results file to diff against')
+    args = parser.parse_args()
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        t0 = time.perf_counter()
+        names, event_ids = generate(args.cadets, args.events, args.excusals, args.overrides, args.seed)
+        print(f'generated {args.cadets} cadets, {args.events} events, {args.excusals} excusals, '
+              f'{args.overrides} overrides in {time.perf_counter() - t0:.1f}s ({dialect})')
+        ctx = {'rng': random.Random(args.seed), 'names': names, 'event_ids': event_ids, 'extra': 0,
+               'public': app.test_client(), 'staff': staff_client(app)}
+
+        results = {}
+        print(f'{"scenario":<20}{"reqs":>6}{"errs":>6}{"p50 ms":>10}{"p95 ms":>10}{"req/s":>9}{"queries":>9}')
+        for name, share, step in SCENARIOS:
+            if args.only and name not in args.only:
+                continue
+            r = results[name] = run_scenario(ctx, step, max(1, int(args.requests * share)))
+            print(f'{name:<20}{r["requests"]:>6}{r["errors"]:>6}{r["p50_ms"]:>10.2f}{r["p95_ms"]:>10.2f}'
+                  f'{r["throughput_rps"]:>9.1f}{r["queries_per_request"]:>9.1f}')
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'database': dialect,
+        'python': sys.version.split()[0],
+        'params': {k: getattr(args, k) for k in ('cadets', 'events', 'excusals', 'overrides', 'requests', 'seed')},
+        'scenarios': results,
+    }
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f'loadtest-{commit or "nogit"}-{datetime.now():%Y%m%d-%H%M%S}.json')
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'results written to {out}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print(f'\ncompared with {old.get("commit")} ({old.get("timestamp")}):')
+        for name, r in results.items():
+            before = old['scenarios'].get(name)
+            if before:
+                print(f'{name:<20} p95 {before["p95_ms"]:>9.2f} -> {r["p95_ms"]:>9.2f} ms '
+                      f'({(r["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0:+.0f}%)  '
+                      f'queries {before["queries_per_request"]} -> {r["queries_per_request"]}')
+    sys.exit(1 if any(r['errors'] for r in results.values()) else 0)
+
+
+if __name__ == '__main__':
+    main()
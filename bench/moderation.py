@@ -0,0 +1,78 @@
+"""Approve a whole event's pending excusals with one /moderate_excusals
+request, then check that explicit ids narrow the selection (JSON and form),
+that malformed bodies are rejected before anything is written, and that the
+headcounts stay exact.
+
+Run from the repository root:
+
+    python -m bench.moderation
+"""
+import sys
+import time
+
+from bench.common import staff_client
+from bench.datagen import generate
+from bench.http_cache import count_queries
+from app import app, db, event_headcounts, recount_event_summaries, Excusal  # noqa: E402
+
+
+def pending_ids(event_id):
+    return [i for (i,) in db.session.query(Excusal.id).filter_by(event_id=event_id, status='pending').order_by(Excusal.id)]
+
+
+def main():
+    failures = 0
+
+    def check(label, ok):
+        nonlocal failures
+        failures += not ok
+        print(f'{label}: {"yes" if ok else "NO"}')
+
+    with app.app_context():
+        _, event_ids = generate(cadets=1000, events=4, excusals=4000, overrides=100)
+    client = staff_client(app)
+
+    with app.app_context():
+        first, second, third = event_ids[:3]
+        ids = pending_ids(second)
+        resp = client.post('/moderate_excusals', json={'action': 'approve', 'event_id': second, 'ids': ids[:1]})
+        check('JSON ids select just those excusals', resp.status_code == 200
+              and resp.get_json()['excusals'] == 1 and pending_ids(second) == ids[1:])
+        resp = client.post('/moderate_excusals', data={'action': 'deny', 'event_id': second, 'ids': ids[1:3]})
+        check('form ids select just those excusals', resp.status_code == 200
+              and resp.get_json()['excusals'] == 2 and pending_ids(second) == ids[3:])
+        resp = client.post('/moderate_excusals', json={'action': 'approve', 'event_id': second, 'ids': []})
+        check('empty ids select nothing', resp.status_code == 200
+              and resp.get_json()['excusals'] == 0 and pending_ids(second) == ids[3:])
+
+        for bad in ([{'action': 'approve', 'event_id': third}],
+                    {'action': 'approve', 'event_id': third, 'ids': str(pending_ids(third)[0])},
+                    {'action': 'approve', 'event_id': third, 'ids': pending_ids(third)[0]},
+                    {'action': 'approve', 'event_id': third, 'ids': ['x']},
+                    {'action': 'approve', 'event_id': third, 'company': 7},
+                    {'action': 'approve'},
+                    {'action': 'promote', 'event_id': third}):
+            before = len(pending_ids(third))
+            resp = client.post('/moderate_excusals', json=bad)
+            check(f'rejected with 400: {str(bad)[:60]}', resp.status_code == 400 and len(pending_ids(third)) == before)
+
+        n = len(pending_ids(first))
+        t0 = time.perf_counter()
+        resp, q = count_queries(lambda: client.post('/moderate_excusals', json={'action': 'approve', 'event_id': first}))
+        print(f'approve {n} pending excusals of one event: {(time.perf_counter() - t0) * 1000:.1f} ms, {q} queries')
+        check('whole event approved', resp.status_code == 200 and resp.get_json()['excusals'] == n
+              and not pending_ids(first))
+
+        incremental = {e: dict(c) for e, c in event_headcounts(event_ids).items()}
+        recount_event_summaries()
+        db.session.commit()
+        check('headcounts match a full recount',
+              incremental == {e: dict(c) for e, c in event_headcounts(event_ids).items()})
+
+    check('requires staff login', app.test_client().post(
+        '/moderate_excusals', json={'action': 'approve', 'event_id': 1}).status_code == 401)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
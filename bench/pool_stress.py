@@ -0,0 +1,137 @@
+"""Hammer the app from more threads than the pool has connections and check
+that the number of open connections stays bounded, that every connection
+is returned, that reads of the @read_replica views go to the replica
+engine, and that a forked child starts with a fresh pool.
+
+Run from the repository root:
+
+    python -m bench.pool_stress [threads] [requests_per_thread]
+
+The replica is the same SQLite file as the primary here; with
+BENCH_DATABASE_URL (and BENCH_REPLICA_URL) it runs against Postgres.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+import bench.common  # noqa: F401  (sets DATABASE_URL)
+
+POOL_SIZE, MAX_OVERFLOW = 4, 2
+os.environ.update(DB_POOL_SIZE=str(POOL_SIZE), DB_MAX_OVERFLOW=str(MAX_OVERFLOW), DB_POOL_TIMEOUT='30',
+                  DATABASE_REPLICA_URL=os.environ.get('BENCH_REPLICA_URL') or os.environ['DATABASE_URL'])
+
+from bench.common import staff_client  # noqa: E402
+from bench.datagen import generate  # noqa: E402
+from sqlalchemy import event as sa_event  # noqa: E402
+from app import app, db  # noqa: E402
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    failures = 0
+    with app.app_context():
+        names, event_ids = generate(cadets=500, events=20, excusals=1000, overrides=200)
+        engines = {'primary': db.engines[None], 'replica': db.engines['replica']}
+    # SQLite under this much write contention makes most requests "slow"
+    logging.getLogger('excusal.requests').setLevel(logging.ERROR)
+    connects = {k: 0 for k in engines}
+    live = {k: 0 for k in engines}
+    peak_live = {k: 0 for k in engines}
+    statements = {k: 0 for k in engines}
+    peak = {k: 0 for k in engines}
+    lock = threading.Lock()
+
+    def opened(key):
+        with lock:
+            connects[key] += 1
+            live[key] += 1
+            peak_live[key] = max(peak_live[key], live[key])
+
+    def closed(key):
+        with lock:
+            live[key] -= 1
+
+    for key, engine in engines.items():
+        engine.dispose()
+        sa_event.listen(engine, 'connect', lambda *a, key=key: opened(key))
+        sa_event.listen(engine.pool, 'close', lambda *a, key=key: closed(key))
+        sa_event.listen(engine, 'before_cursor_execute',
+                        lambda *a, key=key: statements.__setitem__(key, statements[key] + 1))
+
+    errors = []
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            for key, engine in engines.items():
+                peak[key] = max(peak[key], engine.pool.checkedout())
+            time.sleep(0.002)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = staff_client(app)
+        for _ in range(per_thread):
+            ev = rng.choice(event_ids)
+            roll = rng.random()
+            if roll < 0.1:
+                resp = client.post('/excusal', data={'name': rng.choice(names), 'event_id': ev})
+            elif roll < 0.6:
+                resp = client.get(f'/whoiscoming?event_id={ev}')
+            elif roll < 0.8:
+                resp = client.get(f'/export_attendance?event_id={ev}')
+            else:
+                resp = client.get('/pending_excusals')
+            resp.get_data()
+            if resp.status_code >= 400:
+                errors.append(resp.status_code)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+
+    limit = POOL_SIZE + MAX_OVERFLOW
+    print(f'{threads} threads x {per_thread} requests in {elapsed:.1f}s, {len(errors)} errors, pool limit {limit}')
+    failures += bool(errors)
+    for key, engine in engines.items():
+        ok = peak_live[key] <= limit and peak[key] <= limit and engine.pool.checkedout() == 0
+        failures += not ok
+        print(f'{key:<8} connections opened {connects[key]:>3}  peak open {peak_live[key]:>3}  '
+              f'peak checked out {peak[key]:>3}  '
+              f'checked out now {engine.pool.checkedout()}  statements {statements[key]:>6}  {"ok" if ok else "FAIL"}')
+    ok = statements['replica'] > statements['primary']
+    failures += not ok
+    print(f'reads served by the replica: {"yes" if ok else "NO"}')
+
+    if hasattr(os, 'fork'):
+        pid = os.fork()
+        if pid == 0:
+            # the inherited pool was dropped, so this opens a new connection
+            before = connects['primary']
+            inherited = engines['primary'].pool.checkedin()
+            with app.app_context():
+                db.session.execute(db.text('SELECT 1'))
+                db.session.remove()
+            os._exit(0 if inherited == 0 and connects['primary'] == before + 1 else 1)
+        _, status = os.waitpid(pid, 0)
+        ok = os.waitstatus_to_exitcode(status) == 0
+        failures += not ok
+        print(f'forked child starts with an empty pool: {"yes" if ok else "NO"}')
+        with app.app_context():
+            db.session.execute(db.text('SELECT 1'))  # parent's pool still usable
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
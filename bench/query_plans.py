@@ -0,0 +1,83 @@
+"""Show the query plan of every statement the hot routes issue.
+
+Run from the repository root:
+
+    python -m bench.query_plans
+
+Seeds a small SQLite database, requests each route through the test client
+while recording the SQL it runs, then prints EXPLAIN QUERY PLAN (SQLite) or
+EXPLAIN (Postgres, when DATABASE_URL points at one) for each statement, so
+index usage ("USING INDEX ...", "Index Scan ...") can be checked per route.
+"""
+import sys
+
+from bench.common import staff_client
+from sqlalchemy import event as sa_event
+from app import app, db, Cadet, Event, Excusal, AttendanceOverride  # noqa: E402
+
+
+def seed():
+    db.create_all()
+    cadets = [Cadet(name=f'Cadet {i:04d}', rank='') for i in range(200)]
+    events = [Event(name=f'llab {j}', date=f'2099-01-{j + 1:02d}') for j in range(10)]
+    db.session.add_all(cadets + events)
+    db.session.flush()
+    for i, c in enumerate(cadets):
+        e = events[i % len(events)]
+        db.session.add(Excusal(cadet_id=c.id, event_id=e.id, name=c.name, event=e.name, excused_from=e.name, date='2099-01-01', status='pending'))
+        if i % 5 == 0:
+            db.session.add(AttendanceOverride(cadet_id=c.id, event_id=e.id, status='excused'))
+    db.session.commit()
+    return events[0].id
+
+
+def capture(client, method, url, data=None):
+    seen = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and (statement, parameters) not in seen:
+            seen.append((statement, parameters))
+
+    sa_event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        resp = client.open(url, method=method, data=data)
+        resp.get_data()
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return seen
+
+
+def explain(statement, parameters):
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+    return [str(r[-1]) for r in rows]
+
+
+def main():
+    with app.app_context():
+        ev_id = seed()
+        client = staff_client(app)
+        routes = [
+            ('GET', f'/whoiscoming?event_id={ev_id}', None),
+            ('GET', f'/export_attendance?event_id={ev_id}', None),
+            ('GET', '/attendance_matrix', None),
+            ('GET', '/staff-dashboard', None),
+            ('GET', '/pending_excusals', None),
+            ('GET', '/excusal', None),
+            ('GET', '/events', None),
+            ('POST', '/staff-dashboard', {'bulk_action': 'approve_event', 'event_id': ev_id}),
+        ]
+        for method, url, data in routes:
+            print(f'=== {method} {url}')
+            for statement, parameters in capture(client, method, url, data):
+                if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                    continue
+                print('  ' + ' '.join(statement.split())[:160])
+                for line in explain(statement, parameters):
+                    print('      ' + line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""Timing for the roster "reload_csv" action on a large roster.csv.
+
+Run from the repository root:
+
+    python -m bench.roster_reload [rows]
+
+Writes a synthetic roster.csv (10k rows by default) into a temp directory,
+reloads it into an empty database, then reloads it again when every name
+already exists.
+"""
+import csv
+import os
+import sys
+import time
+
+from bench.common import BENCH_DIR, staff_client
+from app import app, db, Cadet  # noqa: E402
+
+
+def write_roster(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['names'])
+        for i in range(rows):
+            writer.writerow([f'Cadet {i:06d}'])
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    path = os.path.join(BENCH_DIR, 'roster.csv')
+    write_roster(path, rows)
+    app.config['ROSTER_CSV_PATH'] = path
+
+    with app.app_context():
+        db.create_all()
+        client = staff_client(app)
+        for label in ('empty db', 'all existing'):
+            start = time.perf_counter()
+            resp = client.post('/roster', data={'action': 'reload_csv'})
+            elapsed = time.perf_counter() - start
+            assert resp.status_code == 302, resp.status_code
+            print(f'{rows} rows  {label:<13} {elapsed:8.2f} s  cadets={Cadet.query.count()}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Fuzzy roster lookup: suggestion latency on a large roster, ranking of a
+few typical misspellings, and incremental index updates from /roster.
+
+Run from the repository root:
+
+    python -m bench.roster_suggest [cadets]
+"""
+import random
+import statistics
+import sys
+import time
+
+from bench.common import staff_client
+from bench.datagen import FIRST, generate
+from app import app, db, normalize_name, roster_index, Cadet  # noqa: E402
+
+SYLLABLES = ['an', 'bel', 'cor', 'da', 'el', 'fen', 'gar', 'hol', 'is', 'jon', 'ka', 'lin', 'mor', 'nel', 'or',
+             'pa', 'quin', 'ros', 'sal', 'tor', 'ul', 'van', 'wes', 'yar', 'zel', 'ber', 'chi', 'dor', 'ek', 'ford']
+
+
+
+def realistic_names(n, seed=7):
+    # distinct surnames built from syllables, so posting lists look like a
+    # real roster's rather than the few hundred repeated datagen names
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        last = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        names.add(f'{rng.choice(FIRST)} {last}')
+    return sorted(names)
+
+
+# (typed, expected best match)
+CASES = [
+    ('beau buchan', 'Richard (Beau) Buchan'),
+    ('Richard Buchan', 'Richard (Beau) Buchan'),
+    ('Richrd Bucan', 'Richard (Beau) Buchan'),
+    ('Beau Buchn', 'Richard (Beau) Buchan'),
+    ('Noelle Ketoo', 'Noelle Ketoo'),
+    ('noel keto', 'Noelle Ketoo'),
+]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    failures = 0
+    with app.app_context():
+        generate(cadets=0, events=1, excusals=0, overrides=0)
+        db.session.execute(db.insert(Cadet), [{'name': name, 'name_normalized': normalize_name(name), 'status': 'present'}
+                                               for name in realistic_names(n)])
+        db.session.add_all([Cadet(name='Richard (Beau) Buchan'), Cadet(name='Noelle Ketoo')])
+        db.session.commit()
+        t0 = time.perf_counter()
+        roster_index.suggest('warm up')
+        print(f'index built for {n + 2} cadets in {(time.perf_counter() - t0) * 1000:.0f} ms')
+
+        for typed, expected in CASES:
+            best = roster_index.suggest(typed, limit=3)
+            ok = bool(best) and best[0].name == expected
+            failures += not ok
+            print(f'{typed!r:<18} -> {", ".join(f"{m.name} ({m.score})" for m in best):<80} {"ok" if ok else "FAIL"}')
+
+        queries = ['Mat', 'Mateo Kor', 'Karina Belda', 'Isac Vandor', 'zzz', 'Jordan Ek', 'Quinn Hollinm']
+        times = []
+        for _ in range(50):
+            for q in queries:
+                t0 = time.perf_counter()
+                roster_index.suggest(q)
+                times.append((time.perf_counter() - t0) * 1000)
+        times.sort()
+        print(f'suggest over {n + 2} names: median {statistics.median(times):.3f} ms  '
+              f'p95 {times[int(len(times) * 0.95)]:.3f} ms  (includes the roster version check)')
+
+    client = staff_client(app)
+    client.post('/roster', data={'action': 'add', 'name': 'Zephyrine Quarles'})
+    found = client.get('/roster_suggest?q=zephyr').get_json()['suggestions']
+    ok = bool(found) and found[0]['name'] == 'Zephyrine Quarles'
+    failures += not ok
+    with app.app_context():
+        cadet_id = Cadet.query.filter_by(name='Zephyrine Quarles').one().id
+    client.post('/roster', data={'action': 'edit', 'cadet_id': cadet_id, 'name': 'Zephyrine Quarless-Holt'})
+    found = client.get('/roster_suggest?q=quarless holt').get_json()['suggestions']
+    ok2 = bool(found) and found[0]['name'] == 'Zephyrine Quarless-Holt'
+    client.post('/roster', data={'action': 'delete', 'cadet_id': cadet_id})
+    found = client.get('/roster_suggest?q=zephyrine').get_json()['suggestions']
+    ok3 = not any(f['id'] == cadet_id for f in found)
+    rebuilt = roster_index._version is not None
+    failures += not (ok2 and ok3 and rebuilt)
+    print(f'add/edit/delete via /roster reflected incrementally: {"yes" if ok and ok2 and ok3 and rebuilt else "NO"}')
+
+    resp = app.test_client().post('/excusal', data={'name': 'Richrd Buchan'}, follow_redirects=True)
+    ok = 'Did you mean: Richard (Beau) Buchan' in resp.get_data(as_text=True)
+    failures += not ok
+    print(f'misspelled submission gets a suggestion: {"yes" if ok else "NO"}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
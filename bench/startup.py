@@ -0,0 +1,70 @@
+"""Cold-start cost of a worker, and what deferring the schema check to a
+one-off migration (DB_INIT_ON_IMPORT=0, as gunicorn.conf.py runs it) takes
+off it.
+
+Each sample is a fresh interpreter against an already migrated database
+filled by bench.datagen. It imports app.py with DB_INIT_ON_IMPORT=0 and
+then either runs init_db() -- exactly the work DB_INIT_ON_IMPORT=1 does at
+import in every worker -- or skips it, and serves the first request.
+
+Run from the repository root (BENCH_DATABASE_URL can point at a scratch
+Postgres database, where the check costs a connection and the migration
+lock in every worker):
+
+    python -m bench.startup [samples]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import bench.common  # noqa: F401  (sets DATABASE_URL)
+from bench.datagen import generate
+from app import app  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, os, time
+t0 = time.perf_counter()
+import app as m
+t1 = time.perf_counter()
+if os.environ['TIME_INIT'] == '1':
+    m.init_db()
+t2 = time.perf_counter()
+resp = m.app.test_client().get('/excusal')
+t3 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "init_ms": (t2 - t1) * 1000, "first_request_ms": (t3 - t2) * 1000,
+                  "status": resp.status_code}))
+'''
+
+
+def sample(time_init):
+    env = dict(os.environ, DB_INIT_ON_IMPORT='0', TIME_INIT='1' if time_init else '0')
+    out = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    with app.app_context():
+        generate(cadets=2000, events=150, excusals=20000, overrides=2000)
+    failures = 0
+
+    medians = {}
+    for label, time_init in (('schema check at start', True), ('deferred', False)):
+        runs = [sample(time_init) for _ in range(n)]
+        failures += any(r['status'] != 200 for r in runs)
+        imp, init, first = (statistics.median(r[k] for r in runs) for k in ('import_ms', 'init_ms', 'first_request_ms'))
+        medians[label] = init + first
+        print(f'{label:<22} import {imp:7.1f} ms  init_db {init:6.1f} ms  first request {first:6.1f} ms (median of {n})')
+    # the import is the same code either way and its run-to-run noise is
+    # larger than the saving, so it is left out of the comparison
+    print(f'saved per worker start: {medians["schema check at start"] - medians["deferred"]:.1f} ms '
+          f'(init_db plus first request)')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Build the static assets into a scratch copy of static/ and check how
+they are served.
+
+Run from the repository root:
+
+    python -m bench.static_assets
+
+Checks that pages link the fingerprinted files, that /assets/ answers
+with the precompressed variant the client accepts (and the identical
+bytes once decoded), with a year-long immutable Cache-Control, and that a
+rebuild of unchanged files is a no-op. Prints the bytes a first visit to
+the excusal form downloads before and after.
+"""
+import gzip
+import os
+import re
+import shutil
+import sys
+
+from bench.common import BENCH_DIR
+import app as app_module  # noqa: E402
+from app import app, build_static_assets  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def main():
+    failures = 0
+
+    def check(label, ok):
+        nonlocal failures
+        failures += not ok
+        print(f'{label}: {"yes" if ok else "NO"}')
+
+    src = app.static_folder
+    app.static_folder = os.path.join(BENCH_DIR, 'static')
+    shutil.copytree(src, app.static_folder, ignore=shutil.ignore_patterns('dist'))
+    client = app.test_client()
+
+    page = client.get('/excusal').get_data(as_text=True)
+    plain = sum(len(client.get(u).get_data()) for u in re.findall(r'(?:href|src)="(/static/[^"]+)"', page))
+
+    manifest = build_static_assets()
+    check('rebuild is a no-op', build_static_assets() == manifest
+          and len(os.listdir(app_module.static_dist_dir())) == 1 + sum(
+              1 + len(e['encodings']) + len(set(e.get('widths', {}).values()) - {e['path']})
+              for e in manifest.values()))
+    page = client.get('/excusal').get_data(as_text=True)
+    urls = re.findall(r'(?:href|src)="(/assets/[^"]+)"', page)
+    check('pages link fingerprinted assets', '/static/' not in page and len(urls) == 2)
+    check('form image offers a srcset', 'srcset="/assets/excusal_form.' in page)
+
+    css = manifest['style.css']['path']
+    with open(os.path.join(app.static_folder, 'style.css'), 'rb') as f:
+        original = f.read()
+    decoders = {'br': brotli.decompress if brotli else None, 'gzip': gzip.decompress, 'identity': lambda b: b}
+    for accept in (['br', 'gzip', 'identity'] if brotli else ['gzip', 'identity']):
+        resp = client.get(f'/assets/{css}', headers={'Accept-Encoding': accept})
+        body = resp.get_data()
+        check(f'{accept:8} -> {resp.headers.get("Content-Encoding", "identity"):8} {len(body):5d} bytes, decodes to style.css',
+              resp.headers.get('Content-Encoding', 'identity') == accept and decoders[accept](body) == original
+              and resp.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+              and 'Accept-Encoding' in resp.headers.get('Vary', '')
+              and resp.mimetype == 'text/css')
+
+    resp = client.get(f'/assets/{css}', headers={'Accept-Encoding': 'br, gzip'})
+    check('revalidation answers 304', client.get(f'/assets/{css}', headers={
+        'Accept-Encoding': 'br, gzip', 'If-None-Match': resp.headers['ETag']}).status_code == 304)
+    check('/test-image redirects to the fingerprinted image',
+          client.get('/test-image').headers['Location'].startswith('/assets/excusal_form.'))
+
+    built = sum(len(client.get(u, headers={'Accept-Encoding': 'br, gzip'}).get_data()) for u in urls)
+    widths = sorted(int(w) for w in manifest['excusal_form.png'].get('widths', {}))
+    print(f'first visit to /excusal downloads {plain} bytes of assets -> {built} '
+          f'(full-size image; narrow screens pick from widths {widths})')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+# gunicorn picks this file up from the working directory.
+#
+# Schema migrations run once in the master before any worker starts, so the
+# workers themselves skip the import-time init_db(). Importing the app here
+# also means workers fork with it already loaded (like --preload); app.py
+# resets the database pools in each child after fork.
+import os
+
+os.environ.setdefault('DB_INIT_ON_IMPORT', '0')
+
+
+def on_starting(server):
+    # checked before the import: Flask-SQLAlchemy refuses to initialise the
+    # app without a database URI
+    if not os.environ.get('DATABASE_URL'):
+        server.log.warning('DATABASE_URL not set; skipping migrations')
+        return
+    from app import app, db, migrate_db
+
+    with app.app_context():
+        applied = migrate_db()
+        # the master serves no requests; don't keep a connection open
+        for engine in db.engines.values():
+            engine.dispose()
+    server.log.info('database schema up to date (applied migrations: %s)', applied or 'none')